@@ -1,28 +1,121 @@
 import os
+import re
+from multiprocessing import Pool
+from typing import NamedTuple
+
 from lxml import etree
+from xmlIndex import open_index
+from xmlPrefilter import Prefilter
+from xmlScanner import iter_xml_files, long_path
+
+
+class ReportMatch(NamedTuple):
+    path: str
+    term: str   # искомое слово/регулярка, которое нашлось
+    line: int   # строка файла с первым вхождением
+
+
+def compile_terms(search_terms, regex=False):
+    """Строку или список строк -> список (term, скомпилированное выражение)"""
+    if isinstance(search_terms, str):
+        search_terms = [search_terms]
+    return [(term, re.compile(term if regex else re.escape(term))) for term in search_terms]
+
+
+def scan_report(file_path, terms, prefilter=None):
+    """
+    Ищет термы в тегах <QuerySQL> одного файла; каждый терм — до первого вхождения,
+    разбор прекращается, когда найдены все. prefilter=None — без предфильтра (регулярки),
+    иначе разбираются только файлы, в сырых байтах которых есть хотя бы один терм, и только по ним.
+    Возвращает (path, [ReportMatch], ошибка).
+    """
+    try:
+        left = list(terms)
+        if prefilter is not None:
+            found = prefilter.search_file(long_path(file_path))
+            left = [item for item in left if item[0] in found]
+            if not left:
+                return file_path, [], None
+        matches = []
+        # Потоковый парсер, чтобы не грузить весь XML в память
+        for _, elem in etree.iterparse(long_path(file_path), events=("end",), tag="QuerySQL", recover=True):
+            text = elem.text
+            if text:
+                for item in list(left):
+                    m = item[1].search(text)
+                    if m:
+                        line = (elem.sourceline or 1) + text.count("\n", 0, m.start())
+                        matches.append(ReportMatch(file_path, item[0], line))
+                        left.remove(item)
+            elem.clear()
+            if not left:
+                break  # Дальше можно не проверять этот файл
+        return file_path, matches, None
+    except Exception as e:
+        return file_path, [], str(e)
+
+
+_terms = None
+_prefilter = None
 
-def find_xml_with_query(root_folder: str, search_text: str = "eav_projection_data"):
+
+def _init_worker(terms, literals):
+    global _terms, _prefilter
+    _terms = terms
+    _prefilter = Prefilter(literals) if literals is not None else None
+
+
+def _scan_in_worker(file_path):
+    return scan_report(file_path, _terms, _prefilter)
+
+
+def find_xml_with_query(root_folder: str, search_text="eav_projection_data", regex=False, processes=None):
     """
     Рекурсивно обходит папку, ищет XML-файлы и проверяет,
-    содержит ли тег <QuerySQL> указанное слово.
-    Если содержит — выводит путь к файлу.
+    содержит ли тег <QuerySQL> указанное слово (или любое из списка слов/регулярок).
+    Выводит и возвращает найденное: (путь, слово, строка).
     """
-    for dirpath, _, filenames in os.walk(root_folder):
-        for filename in filenames:
-            if filename.lower().endswith(".xml"):
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    # Потоковый парсер, чтобы не грузить весь XML в память
-                    for _, elem in etree.iterparse(file_path, events=("end",), tag="QuerySQL", recover=True):
-                        if elem.text and search_text in elem.text:
-                            print(file_path)
-                            break  # Дальше можно не проверять этот файл
-                        elem.clear()
-                except Exception as e:
-                    print(f"⚠️ Ошибка при чтении {file_path}: {e}")
-
-def main(folder: str):
-    find_xml_with_query(folder)
+    terms = compile_terms(search_text, regex)
+    # для регулярок (и пустого терма) сырые байты не проверить — разбираем все файлы
+    literals = None if regex or not all(term for term, _ in terms) else [term for term, _ in terms]
+    processes = processes or os.cpu_count() or 1
+    files = iter_xml_files(root_folder)
+    if processes == 1:
+        prefilter = Prefilter(literals) if literals is not None else None
+        results = (scan_report(path, terms, prefilter) for path in files)
+        found = _report(results)
+    else:
+        # предфильтр (Ахо–Корасик/альтернатива) собирается в каждом воркере один раз
+        with Pool(processes, initializer=_init_worker, initargs=(terms, literals)) as pool:
+            found = _report(pool.imap(_scan_in_worker, files, chunksize=16))
+    return found
+
+
+def _report(results):
+    found = []
+    for file_path, matches, error in results:
+        if error:
+            print(f"⚠️ Ошибка при чтении {file_path}: {error}")
+        for match in matches:
+            print(f"{match.path}:{match.line}\t{match.term}")
+        found.extend(matches)
+    return found
+
+
+def find_xml_with_query_indexed(root_folder: str, search_text="eav_projection_data", regex=False):
+    """То же, что find_xml_with_query, но по SQLite-индексу папки (переразбираются только изменённые файлы)"""
+    terms = [term for term, _ in compile_terms(search_text, regex)]  # битая регулярка — ошибка до обхода папки
+    with open_index(root_folder) as index:
+        for term in terms:
+            for file_path in index.find_query_sql(term, regex):
+                print(f"{file_path}\t{term}")
+
+
+def main(folder: str, use_index=False, search_text="eav_projection_data", regex=False):
+    if use_index:
+        find_xml_with_query_indexed(folder, search_text, regex)
+    else:
+        find_xml_with_query(folder, search_text, regex)
 # if __name__ == "__main__":
 #     folder = input("Введите путь к папке: ").strip()
 #     find_xml_with_query(folder)
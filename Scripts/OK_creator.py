@@ -2,12 +2,13 @@ import re
 import pyperclip
 from langdetect import detect
 from deep_translator import GoogleTranslator
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
- 
-# Инициализируем модель один раз
-kw_model = KeyBERT(model=SentenceTransformer('all-MiniLM-L6-v2'))
+from embeddingBackend import MODEL_ID, extract_keywords
+from snakeCache import SnakeCache
+TRANSLATOR_NAME = 'google:ru-en'
+# Модель эмбеддингов загружается лениво (при первом промахе кэша) и одна на процесс
+
+# Постоянный кэш переводов и кодов между запусками
+cache = SnakeCache()
  
 # Английские и русские стоп-слова
 EN_STOP_WORDS = {
@@ -27,7 +28,7 @@ def detect_language(text):
     except:
         return 'en'  # по умолчанию
  
-def translate_if_needed(text):
+def needs_translation(text):
     word_count = len(text.strip().split())
  
     try:
@@ -36,14 +37,49 @@ def translate_if_needed(text):
         lang = 'unknown'
  
     # Если мало слов или язык не определён — форсируем перевод
-    if lang == 'ru' or lang == 'unknown' or word_count <= 4:
+    return lang == 'ru' or lang == 'unknown' or word_count <= 4
+ 
+@cache.memoize('translate', TRANSLATOR_NAME)
+def translate(text):
+    return GoogleTranslator(source='ru', target='en').translate(text)
+ 
+def translate_if_needed(text):
+    if needs_translation(text):
         try:
-            return GoogleTranslator(source='ru', target='en').translate(text)
+            return translate(text)
         except:
             pass  # Если не удалось перевести — вернём как есть
  
     return text
  
+def translate_batch(texts):
+    """Переводит список строк одним переводчиком (с учётом кэша); при сбое пакета — по одной"""
+    result = {t: t for t in texts}
+    to_translate = []
+    for t in texts:
+        if not needs_translation(t):
+            continue
+        cached = cache.get(cache.make_key('translate', TRANSLATOR_NAME, t))
+        if cached is not None:
+            result[t] = cached
+        else:
+            to_translate.append(t)
+    if not to_translate:
+        return result
+    try:
+        translated = GoogleTranslator(source='ru', target='en').translate_batch(to_translate)
+        for t, tr in zip(to_translate, translated):
+            if tr:
+                result[t] = tr
+                cache.set(cache.make_key('translate', TRANSLATOR_NAME, t), tr)
+    except:
+        for t in to_translate:
+            try:
+                result[t] = translate(t) or t
+            except:
+                pass  # Если не удалось перевести — оставим как есть
+    return result
+ 
 def clean_keywords(keywords, stop_words, min_len=3):
     # Фильтруем ключевые слова
     result = []
@@ -54,11 +90,23 @@ def clean_keywords(keywords, stop_words, min_len=3):
     return result
  
 
+def snake_key(text, max_words):
+    # единый ключ кэша кодов: max_words входит всегда, в т.ч. по умолчанию
+    return cache.make_key('snake', MODEL_ID, text, max_words)
+
+
 def smart_snake_case(text, max_words=5):
-    keywords = kw_model.extract_keywords(text, top_n=15, stop_words='english')
+    key = snake_key(text, max_words)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    keywords = extract_keywords(text, top_n=15, stop_words='english')
     stop_words = EN_STOP_WORDS  # поскольку текст уже переведён
     cleaned = clean_keywords(keywords, stop_words)
-    return '_'.join(cleaned[:max_words])
+    result = '_'.join(cleaned[:max_words])
+    if result:
+        cache.set(key, result)
+    return result
 
 
 def api_function(user_input):
@@ -72,6 +120,38 @@ def api_function(user_input):
     except Exception as e:
         return f"⚠️ Ошибка: {e}\n"
 
+
+def api_function_batch(names, max_words=5):
+    """
+    Коды для списка названий: названия дедуплицируются, переводятся одним пакетом
+    и прогоняются через модель за один вызов extract_keywords (только то, чего нет в кэше).
+    Возвращает {название: код}.
+    """
+    unique = list(dict.fromkeys(n for n in names if n))
+    if not unique:
+        return {}
+    try:
+        translated = translate_batch(unique)
+        codes = {}
+        missing = []
+        for text in dict.fromkeys(translated[n] for n in unique):
+            cached = cache.get(snake_key(text, max_words))
+            if cached is not None:
+                codes[text] = cached
+            else:
+                missing.append(text)
+        if missing:
+            keywords = extract_keywords(missing, top_n=15, stop_words='english')
+            if len(missing) == 1:
+                keywords = [keywords]  # для одного документа KeyBERT возвращает плоский список
+            for text, kw in zip(missing, keywords):
+                codes[text] = '_'.join(clean_keywords(kw, EN_STOP_WORDS)[:max_words])
+                if codes[text]:
+                    cache.set(snake_key(text, max_words), codes[text])
+        return {name: codes[translated[name]] for name in unique}
+    except Exception as e:
+        return {name: f"⚠️ Ошибка: {e}\n" for name in unique}
+
 import xml.etree.ElementTree as ET
 
 
@@ -101,14 +181,14 @@ def print_xml_tree_detailed(element, indent=0, path=""):
         print(' ' * indent + f"</{element.tag}>")
 
 
-def create_section(name):
-    code_section = api_function(name)
+def create_section(name, codes=None):
+    code_section = codes.get(name) if codes is not None else api_function(name)
     print(f'create section: {code_section}')
     return ET.Element("TabSection", {'code': code_section, 'name': name})
 
 
-def create_tab(name, sections):
-    code_tab = api_function(name)
+def create_tab(name, sections, codes=None):
+    code_tab = codes.get(name) if codes is not None else api_function(name)
     print(f'create tab: {code_tab}')
     attrs_tab = {
         'code': code_tab, 
@@ -118,7 +198,7 @@ def create_tab(name, sections):
     }
     tab = ET.Element("FormTab", attrs_tab)
     for el in sections:
-        tab.append(create_section(el))
+        tab.append(create_section(el, codes))
     # print_xml_tree_detailed(tab)
     return tab
 
@@ -133,11 +213,15 @@ def main(input_file, output_file):
     root = ET.parse(output_file).getroot()
     dn_form = root.find(".//DynamicForm")
 
+    # все названия вкладок и секций обрабатываются одним пакетом
+    all_names = [name for tab, sections in structure.items() for name in (tab, *sections)]
+    codes = api_function_batch(all_names)
+
     for item in structure.items():
-        dn_form.append(create_tab(*item))
+        dn_form.append(create_tab(*item, codes=codes))
     
     # print_xml_tree_detailed(dn_form)
 
     new_tree = ET.ElementTree(root)
     new_tree.write(output_file, encoding="utf-8", xml_declaration=True)
-
+    cache.print_stats()
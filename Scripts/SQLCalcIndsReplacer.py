@@ -1,119 +1,138 @@
 import xml.etree.ElementTree as ET
+import os
 import re
-
-INDICATORS = {}
-SQL_QUERIES = []
-
-
-# --- рекурсивная функция раскрытия формул ---
-def expand_formula(code, visited=None, base_codes=None):
-    if visited is None:
-        visited = set()
-    if base_codes is None:
-        base_codes = set()
-
-    if code in visited:
-        return "i" + code, base_codes  # защита от циклов
-    visited.add(code)
-
-    ind = INDICATORS.get(code)
-    if not ind:
-        return "i" + code, base_codes
-
-    if ind["type"] != "CALCULATED" or not ind["expr"]:
-        base_codes.add(code)
-        return "i" + code, base_codes
-
-    expr = ind["expr"]
-    refs = re.findall(r"i(\d+)", expr)
-
-    new_expr = expr
-    for r in refs:
-        sub_expr, base_codes = expand_formula(r, visited, base_codes)
-        new_expr = new_expr.replace(f"i{r}", f"({sub_expr})")
-
-    return new_expr, base_codes
-
-
-# --- парсер аргументов json_build_array ---
-def split_sql_args(arg_str: str):
-    args = []
-    current = []
-    depth = 0
-    quote = None
-    escape = False
-
-    for ch in arg_str:
-        if escape:
-            current.append(ch)
-            escape = False
-            continue
-
-        if ch == '\\':
-            escape = True
-            current.append(ch)
-            continue
-
-        if quote:
-            current.append(ch)
-            if ch == quote:
-                quote = None
-            continue
-
-        if ch in ('"', "'"):
-            quote = ch
-            current.append(ch)
-            continue
-
-        if ch == '(':
-            depth += 1
-            current.append(ch)
-            continue
-
-        if ch == ')':
-            depth -= 1
-            current.append(ch)
-            continue
-
-        if ch == ',' and depth == 0 and not quote:
-            arg = ''.join(current).strip()
-            if arg:
-                args.append(arg)
-            current = []
+import sys
+from multiprocessing import Pool
+from typing import NamedTuple
+from indicatorGraph import REF_RE, Indicator, IndicatorGraph
+
+# --- потоковая загрузка показателей ---
+def iter_indicators(inds_file):
+    """
+    Потоково читает файл показателей (iterparse), разобранные элементы сразу удаляются.
+    Выдаёт (code, type, expr); expr — формула расчётного показателя или None.
+    """
+    stack = []
+    in_indicator = 0
+    for event, elem in ET.iterparse(inds_file, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == "Indicator":
+                in_indicator += 1
             continue
-
-        current.append(ch)
-
-    if current:
-        args.append(''.join(current).strip())
-
-    return args
+        stack.pop()
+        if elem.tag == "Indicator":
+            in_indicator -= 1
+            type_ = elem.get("type")
+            expr = None
+            if type_ == "CALCULATED":
+                calc = elem.find("IndicatorCalculationParameter")
+                expr = calc.get("expressionSource") if calc is not None else None
+            yield elem.get("code"), type_, expr or None
+        if not in_indicator and stack:
+            stack[-1].remove(elem)  # обработанное поддерево больше не нужно
+
+
+def load_indicators(inds_file, codes=None):
+    """
+    Хранятся только code -> Indicator(type, expr); нерасчётные показатели одного типа делят одну запись.
+    codes — оставить только эти коды и их зависимости: лишние отбрасываются прямо при разборе.
+    Если формула ссылается на показатель, описанный в файле раньше неё, нужен ещё проход по файлу.
+    """
+    shared = {}  # своё на каждый вызов: тёплый воркер не должен держать записи прошлых запусков
+
+    def record(type_, expr):
+        if expr:
+            return Indicator(sys.intern(type_), expr)
+        rec = shared.get(type_)
+        if rec is None:
+            rec = shared[type_] = Indicator(type_, None)
+        return rec
+
+    if codes is None:
+        return {code: record(type_, expr) for code, type_, expr in iter_indicators(inds_file)}
+
+    indicators = {}
+    wanted = set(codes)
+    while wanted:
+        skipped = set()
+        for code, type_, expr in iter_indicators(inds_file):
+            if code in indicators:
+                continue
+            if code not in wanted:
+                skipped.add(code)
+                continue
+            indicators[code] = record(type_, expr)
+            if expr:
+                wanted.update(ref for ref in REF_RE.findall(expr) if ref not in indicators)
+        # повторно ищем только то, на что сослались уже после описания показателя
+        wanted = (wanted & skipped) - indicators.keys()
+    return indicators
+
+
+def sql_indicator_codes(query):
+    """Коды показателей из вызовов json_build_array (третий аргумент)"""
+    codes = []
+    for args in extract_json_build_array_args(query):
+        if len(args) >= 2:
+            codes.append(re.sub(r"['\"]", "", args[1]))
+    return codes
+
+
+# --- однопроходный сканер вызовов json_build_array ---
+_SQL_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*'?)     # строка в одинарных кавычках
+  | (?P<ident>"(?:[^"\\]|\\.|"")*"?)     # идентификатор в двойных кавычках
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z)) # комментарии
+  | (?P<call>\bjson_build_array\s*\()
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<comma>,)
+""", re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+
+class JsonBuildArrayCall(NamedTuple):
+    start: int   # смещение начала "json_build_array"
+    end: int     # смещение сразу после закрывающей скобки
+    args: list   # аргументы вызова (строки, без пробелов по краям)
+
+
+def iter_json_build_array_calls(sql_text: str):
+    """
+    Один проход по SQL: находит вызовы json_build_array верхнего уровня (вложенные
+    остаются внутри аргументов) с учётом строк, комментариев и вложенных скобок.
+    """
+    stack = []  # на каждую открытую скобку: None или [start, [границы аргументов]] для json_build_array
+    in_call = False
+    for m in _SQL_TOKEN_RE.finditer(sql_text):
+        kind = m.lastgroup
+        if kind == "call":
+            if in_call:
+                stack.append(None)  # вложенный вызов — часть аргумента внешнего
+            else:
+                stack.append([m.start(), [m.end()]])
+                in_call = True
+        elif kind == "open":
+            stack.append(None)
+        elif kind == "comma":
+            if stack and stack[-1] is not None:
+                stack[-1][1].append(m.end())
+        elif kind == "close":
+            if not stack:
+                continue
+            frame = stack.pop()
+            if frame is None:
+                continue
+            in_call = False
+            start, bounds = frame
+            bounds.append(m.end())
+            args = [sql_text[a:b - 1].strip() for a, b in zip(bounds, bounds[1:])]
+            yield JsonBuildArrayCall(start, m.end(), [a for a in args if a])
 
 
 def extract_json_build_array_args(sql_text: str):
-    results = []
-    i = 0
-    while True:
-        match = re.search(r'json_build_array\s*\(', sql_text[i:], re.IGNORECASE)
-        if not match:
-            break
-        start = i + match.end()
-        depth = 1
-        j = start
-        while j < len(sql_text) and depth > 0:
-            if sql_text[j] == '(':
-                depth += 1
-            elif sql_text[j] == ')':
-                depth -= 1
-            j += 1
-        inner = sql_text[start:j-1]
-        i = j
-        args = split_sql_args(inner)
-        if len(args) > 2:
-            results.append(args[2:])  # берём аргументы начиная с третьего
-        else:
-            results.append([])
-    return results
+    # берём аргументы начиная с третьего
+    return [call.args[2:] for call in iter_json_build_array_calls(sql_text)]
 
 
 def extract_other_codes_from_sql(sql_text):
@@ -125,9 +144,23 @@ def generate_sql_block(codeOM, codeInd, periodStart, periodEnd):
 
 
 # --- обновление SQL ---
+_ALIAS_RE = re.compile(r"\s+AS\s+ind[0-9]+,", re.IGNORECASE)
+_CODE_ARG_RE = re.compile(r"'[0-9]+'")
+
+
+def is_indicator_value_call(call: JsonBuildArrayCall):
+    """json_build_array(..., 'get-indicator-value', ..., '<код>', ...)"""
+    for i, arg in enumerate(call.args):
+        if arg.lower() == "'get-indicator-value'":
+            return any(_CODE_ARG_RE.fullmatch(a) for a in call.args[i + 1:])
+    return False
+
+
 def update_sql_with_new_codes(sql_text, all_base_codes):
-    # Все вызовы json_build_array
-    array_args = extract_json_build_array_args(sql_text)
+    """Возвращает (новый SQL, коды без исходного json_build_array)"""
+    # Все вызовы json_build_array (один проход по тексту)
+    calls = list(iter_json_build_array_calls(sql_text))
+    array_args = [call.args[2:] for call in calls]
 
     # Соберём все коды из них (третий аргумент — это код индикатора)
     existing_codes = []
@@ -140,8 +173,7 @@ def update_sql_with_new_codes(sql_text, all_base_codes):
     used_codes = extract_other_codes_from_sql(sql_text)
 
     # Заменяем json_build_array(...) AS indXXXX на развёрнутые блоки
-    def replacer_json(match):
-        code = match.group(1)
+    def replacement():
         ans = []
         for base_code in all_base_codes:
             if base_code not in used_codes:
@@ -153,56 +185,92 @@ def update_sql_with_new_codes(sql_text, all_base_codes):
                     used_codes.append(base_code)
         return "\n".join(ans)
 
-    sql_text = re.sub(
-        r"json_build_array\s*\([^)]*'get-indicator-value'[^)]*'([0-9]+)'[^)]*\)\s+AS\s+ind[0-9]+,",
-        replacer_json,
-        sql_text,
-        flags=re.IGNORECASE
-    )
-
-    SQL_QUERIES.append(sql_text)
-    print(f"[OK] Заменены JSON функции на блоки. Добавлены новые блоки для кодов: {missing_codes}")
+    # собираем результат по смещениям вызовов, без повторных проходов по тексту
+    parts = []
+    pos = 0
+    for call in calls:
+        if not is_indicator_value_call(call):
+            continue
+        alias = _ALIAS_RE.match(sql_text, call.end)
+        if not alias:
+            continue
+        parts.append(sql_text[pos:call.start])
+        parts.append(replacement())
+        pos = alias.end()
+    parts.append(sql_text[pos:])
+    return "".join(parts), missing_codes
 
 
 # --- основной процесс ---
-def main(inds_file, sql_file_input, sql_file_output):
-    tree = ET.parse(inds_file)
-    root = tree.getroot()
+# --- обработка одного запроса (без общего состояния — можно выполнять в пуле процессов) ---
+def process_query(query, graph, initial_codes=None):
+    """Возвращает (новый текст запроса, строки лога)"""
+    if initial_codes is None:
+        initial_codes = sql_indicator_codes(query)
+    final_formulas = {}
+    all_base_codes = set()
+    for code in initial_codes:
+        formula, base_codes = graph.expand(code)
+        final_formulas[code] = formula
+        all_base_codes.update(base_codes)
 
-    for ind in root.findall(".//Indicator"):
-        code = ind.get("code")
-        type_ = ind.get("type")
-        calc = ind.find("IndicatorCalculationParameter")
-        expr = calc.get("expressionSource") if calc is not None else None
-        INDICATORS[code] = {"type": type_, "expr": expr}
+    log = ["Развёрнутые формулы:"]
+    for k, v in final_formulas.items():
+        log.append(f"{k}: {v}")
+
+    log.append("\nБазовые индикаторы:")
+    log.append(str(sorted(all_base_codes)))
+
+    # сортируем, чтобы результат не зависел от порядка множества в конкретном процессе
+    new_query, missing_codes = update_sql_with_new_codes(query, sorted(all_base_codes))
+    log.append(f"[OK] Заменены JSON функции на блоки. Добавлены новые блоки для кодов: {missing_codes}")
+    return new_query, log
+
+
+_graph = None
 
-    with open(sql_file_input, encoding="utf-8") as f:
-        sql_text = f.read()
 
-    for query in sql_text.split('--NEXT_QUERY'):
-        # Находим все json_build_array вызовы
-        json_args = extract_json_build_array_args(query)
-        initial_codes = []
-        for args in json_args:
-            if len(args) >= 2:
-                code = re.sub(r"['\"]", "", args[1])
-                initial_codes.append(code)
+def _init_worker(indicators):
+    global _graph
+    _graph = IndicatorGraph(indicators)
 
-        final_formulas = {}
-        all_base_codes = set()
-        for code in initial_codes:
-            formula, base_codes = expand_formula(code)
-            final_formulas[code] = formula
-            all_base_codes.update(base_codes)
 
-        print("Развёрнутые формулы:")
-        for k, v in final_formulas.items():
-            print(f"{k}: {v}")
+def _process_query_in_worker(item):
+    query, initial_codes = item
+    return process_query(query, _graph, initial_codes)
 
-        print("\nБазовые индикаторы:")
-        print(sorted(all_base_codes))
 
-        update_sql_with_new_codes(query, all_base_codes)
+# --- основной процесс ---
+def main(inds_file, sql_file_input, sql_file_output, processes=None):
+    with open(sql_file_input, encoding="utf-8") as f:
+        sql_text = f.read()
+    queries = sql_text.split('--NEXT_QUERY')
+    query_codes = [sql_indicator_codes(query) for query in queries]
 
+    # из файла показателей остаются только коды из SQL и их зависимости
+    indicators = load_indicators(inds_file, {code for codes in query_codes for code in codes})
+
+    # граф формул строится один раз; раскрытия мемоизируются и общие для всех запросов
+    graph = IndicatorGraph(indicators)
+    for cycle in graph.cycles:
+        print(f"[WARN] Циклическая зависимость показателей (не раскрывается): {cycle}")
+
+    processes = processes or os.cpu_count() or 1
+    items = list(zip(queries, query_codes))
     with open(sql_file_output, "w", encoding="utf-8") as f:
-        f.write("--NEXT_QUERY".join(SQL_QUERIES))
+        if processes == 1 or len(items) < 2:
+            results = (process_query(query, graph, codes) for query, codes in items)
+            _write_results(f, results)
+        else:
+            # запросы обрабатываются параллельно, результат пишется по мере готовности в исходном порядке
+            with Pool(min(processes, len(items)), initializer=_init_worker, initargs=(indicators,)) as pool:
+                _write_results(f, pool.imap(_process_query_in_worker, items))
+
+
+def _write_results(f, results):
+    for num, (new_query, log) in enumerate(results):
+        for line in log:
+            print(line)
+        if num:
+            f.write("--NEXT_QUERY")
+        f.write(new_query)
@@ -1,16 +1,20 @@
+import codecs
+import io
+import os
 import re
 from datetime import datetime
+from functools import lru_cache
+from multiprocessing import Pool
 import sys
+from batchFiles import collect_files, is_batch_input
 
-# шаблон для indicator_value_on_year
-year_pattern = re.compile(
-    r"monitoring\.indicator_value_on_year\s*\(\s*[^,]+,\s*[^,]+,\s*([^,]+),\s*([^)]+)\)",
-    re.IGNORECASE
-)
-
-# шаблон для indicator_value_on_period
-period_pattern = re.compile(
-    r"monitoring\.indicator_value_on_period\s*\(\s*[^,]+,\s*[^,]+,\s*([^,]+),\s*'([^']+)',\s*'([^']+)'\s*\)",
+# indicator_value_on_year и indicator_value_on_period одним проходом
+combined_pattern = re.compile(
+    r"monitoring\.indicator_value_on_(?:"
+    r"year\s*\(\s*[^,]+,\s*[^,]+,\s*(?P<year_code>[^,]+),\s*(?P<year>[^)]+)\)"
+    r"|"
+    r"period\s*\(\s*[^,]+,\s*[^,]+,\s*(?P<period_code>[^,]+),\s*'(?P<date_start>[^']+)',\s*'[^']+'\s*\)"
+    r")",
     re.IGNORECASE
 )
 
@@ -31,31 +35,118 @@ TEMPLATE = """(
       )
 )"""
 
-def replace_year(match):
-    code = match.group(1).strip().strip("'\"")   # 3-й аргумент
-    year = match.group(2).strip()               # 4-й аргумент
-    return TEMPLATE.format(code=code, year=year)
+@lru_cache(maxsize=4096)
+def year_of(date_start: str) -> int:
+    # достаем год из даты (одни и те же даты повторяются — разбираем один раз)
+    return datetime.strptime(date_start, "%Y-%m-%d").year
 
-def replace_period(match):
-    code = match.group(1).strip().strip("'\"")  # 3-й аргумент
-    date_start = match.group(2).strip()
-    # достаем год из даты
-    year = datetime.strptime(date_start, "%Y-%m-%d").year
+def replace_combined(match):
+    if match.group("year_code") is not None:
+        code = match.group("year_code").strip().strip("'\"")
+        year = match.group("year").strip()
+    else:
+        code = match.group("period_code").strip().strip("'\"")
+        year = year_of(match.group("date_start").strip())
     return TEMPLATE.format(code=code, year=year)
 
+def rewrite_sql(sql: str, out) -> int:
+    """Один проход по тексту: куски без изменений и замены сразу пишутся в out. Возвращает число замен."""
+    pos = 0
+    count = 0
+    for match in combined_pattern.finditer(sql):
+        out.write(sql[pos:match.start()])
+        out.write(replace_combined(match))
+        pos = match.end()
+        count += 1
+    out.write(sql[pos:])
+    return count
+
 def transform_sql(sql: str) -> str:
-    sql = year_pattern.sub(replace_year, sql)
-    sql = period_pattern.sub(replace_period, sql)
-    return sql
+    out = io.StringIO()
+    rewrite_sql(sql, out)
+    return out.getvalue()
 
-def main(input_file: str, output_file: str):
-    with open(input_file, "r", encoding="utf-8") as f:
-        sql_text = f.read()
+CHUNK_SIZE = 4 * 1024 * 1024   # сколько байт читать за раз
+LOOKAHEAD = 64 * 1024          # хвост буфера, который ждёт следующего куска (длиннее вызовы не бывают)
 
-    transformed = transform_sql(sql_text)
+def transform_stream(fin, out, total_size=None, progress=True) -> int:
+    """
+    Потоковая замена: fin (бинарный, UTF-8) читается кусками, результат сразу пишется в out.
+    Замены применяются только к совпадениям, начинающимся до последних LOOKAHEAD символов буфера,
+    поэтому вызов, разрезанный границей куска, обрабатывается уже со следующим куском.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    count = 0
+    done = 0
+    next_report = 0.0
+    while True:
+        raw = fin.read(CHUNK_SIZE)
+        eof = not raw
+        done += len(raw)
+        buf += decoder.decode(raw, final=eof)
+        limit = len(buf) if eof else len(buf) - LOOKAHEAD
+        if limit <= 0 and not eof:
+            continue
+        pos = 0
+        for match in combined_pattern.finditer(buf):
+            if match.start() >= limit:
+                break
+            out.write(buf[pos:match.start()])
+            out.write(replace_combined(match))
+            pos = match.end()
+            count += 1
+        cut = max(pos, limit)
+        out.write(buf[pos:cut])
+        buf = buf[cut:]
+        if progress and total_size and (eof or next_report <= done / total_size < 1):
+            print(f"Обработано {done / total_size:.0%} ({done / 2**20:.0f} из {total_size / 2**20:.0f} МБ), замен {count}")
+            next_report = done / total_size + 0.05
+        if eof:
+            return count
+
+def transform_file(input_file: str, output_file: str, progress=True) -> int:
+    # файл не читается целиком: память не зависит от размера дампа
+    total_size = os.path.getsize(input_file)
+    with open(input_file, "rb") as fin, open(output_file, "w", encoding="utf-8", newline="") as out:
+        return transform_stream(fin, out, total_size, progress and total_size > 4 * CHUNK_SIZE)
+
+def _transform_pair(pair):
+    src, dst = pair
+    try:
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        return src, transform_file(src, dst, progress=False), None
+    except Exception as e:
+        return src, 0, str(e)
+
+def transform_batch(input_path: str, output_dir: str, processes=None):
+    """Обрабатывает папку/glob SQL-файлов параллельно; результаты кладёт в output_dir с той же структурой"""
+    pairs = [(src, os.path.join(output_dir, rel)) for src, rel in collect_files(input_path, "*.sql")]
+    if not pairs:
+        print(f"Не найдено SQL-файлов: {input_path}")
+        return
+    processes = min(processes or os.cpu_count() or 1, len(pairs))
+    if processes == 1:
+        _report_batch(map(_transform_pair, pairs))
+    else:
+        with Pool(processes) as pool:
+            _report_batch(pool.imap_unordered(_transform_pair, pairs))
+    print(f"Обработка завершена. Результаты сохранены в {output_dir}")
+
+def _report_batch(results):
+    for src, count, error in results:
+        if error:
+            print(f"Ошибка: {src}: {error}")
+        else:
+            print(f"{src}: замен {count}")
+
+def main(input_file: str, output_file: str):
+    # input_file может быть папкой или glob-шаблоном — тогда output_file это папка для результатов
+    if is_batch_input(input_file):
+        transform_batch(input_file, output_file)
+        return
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(transformed)
+    transform_file(input_file, output_file)
 
     print(f"Обработка завершена. Результат сохранён в {output_file}")
 
@@ -2,12 +2,13 @@ import re
 import pyperclip
 from langdetect import detect
 from deep_translator import GoogleTranslator
-from keybert import KeyBERT
-from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
- 
-# Инициализируем модель один раз
-kw_model = KeyBERT(model=SentenceTransformer('all-MiniLM-L6-v2'))
+from embeddingBackend import MODEL_ID, extract_keywords
+from snakeCache import SnakeCache
+TRANSLATOR_NAME = 'google:ru-en'
+# Модель эмбеддингов загружается лениво (при первом промахе кэша) и одна на процесс
+
+# Постоянный кэш переводов и кодов между запусками
+cache = SnakeCache()
  
 # Английские и русские стоп-слова
 EN_STOP_WORDS = {
@@ -27,6 +28,10 @@ def detect_language(text):
     except:
         return 'en'  # по умолчанию
  
+@cache.memoize('translate', TRANSLATOR_NAME)
+def translate(text):
+    return GoogleTranslator(source='ru', target='en').translate(text)
+ 
 def translate_if_needed(text):
     word_count = len(text.strip().split())
  
@@ -38,7 +43,7 @@ def translate_if_needed(text):
     # Если мало слов или язык не определён — форсируем перевод
     if lang == 'ru' or lang == 'unknown' or word_count <= 4:
         try:
-            return GoogleTranslator(source='ru', target='en').translate(text)
+            return translate(text)
         except:
             pass  # Если не удалось перевести — вернём как есть
  
@@ -53,11 +58,22 @@ def clean_keywords(keywords, stop_words, min_len=3):
             result.append(word)
     return result
  
+def snake_key(text, max_words):
+    # единый ключ кэша кодов: max_words входит всегда, в т.ч. по умолчанию
+    return cache.make_key('snake', MODEL_ID, text, max_words)
+ 
 def smart_snake_case(text, max_words=5):
-    keywords = kw_model.extract_keywords(text, top_n=15, stop_words='english')
+    key = snake_key(text, max_words)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    keywords = extract_keywords(text, top_n=15, stop_words='english')
     stop_words = EN_STOP_WORDS  # поскольку текст уже переведён
     cleaned = clean_keywords(keywords, stop_words)
-    return '_'.join(cleaned[:max_words])
+    result = '_'.join(cleaned[:max_words])
+    if result:
+        cache.set(key, result)
+    return result
  
 def main():
     print("💡 Введите строку (Ctrl+C для выхода):")
@@ -72,6 +88,7 @@ def main():
             print(f"✅ Скопировано в буфер обмена: {result}\n")
         except KeyboardInterrupt:
             print("\n🚪 Выход из программы.")
+            cache.print_stats()
             break
         except Exception as e:
             print(f"⚠️ Ошибка: {e}\n")
@@ -0,0 +1,25 @@
+"""
+Общий сбор файлов для пакетного режима скриптов (converterBP, SQLIndsReplacer)
+- вход — папка (файлы по шаблону рекурсивно) или glob-шаблон
+- результат — пары (исходный файл, путь относительно базы), чтобы повторить структуру в папке вывода
+"""
+import glob
+import os
+
+
+def is_batch_input(path):
+    """Папка или glob-шаблон; существующий файл (даже с [ ] в имени) шаблоном не считается"""
+    if os.path.isdir(path):
+        return True
+    return not os.path.exists(path) and any(c in path for c in "*?[")
+
+
+def collect_files(input_path, pattern):
+    """Пары (исходный файл, путь относительно базы) для папки (рекурсивно pattern) или glob-шаблона"""
+    if os.path.isdir(input_path):
+        base = input_path
+        files = glob.glob(os.path.join(glob.escape(input_path), "**", pattern), recursive=True)
+    else:
+        files = glob.glob(input_path, recursive=True)
+        base = os.path.commonpath([os.path.dirname(f) for f in files]) if files else ""
+    return [(f, os.path.relpath(f, base)) for f in sorted(files) if os.path.isfile(f)]
@@ -1,11 +1,18 @@
+import hashlib
 import re
 import json
 import os
+from multiprocessing import Pool
+from batchFiles import collect_files, is_batch_input
 
 REPLACEMENTS_FILE = r"C:\Users\a.medvedev\Documents\projects\managerScripts\scriptsManager\Scripts\replacements.json"
 input_file = r"C:\Users\a.medvedev\Documents\code\Добавить данные по Допланированию для Цифрового паспорта региона.bpmn"
 output_file = r"C:\Users\a.medvedev\Documents\code\Добавить данные по Допланированию для Цифрового паспорта региона3.bpmn"
 
+if not os.path.exists(REPLACEMENTS_FILE):
+    # на другой машине берём replacements.json рядом со скриптом
+    REPLACEMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replacements.json")
+
 
 def load_replacements():
     if os.path.exists(REPLACEMENTS_FILE):
@@ -19,37 +26,173 @@ def save_replacements(replacements):
         json.dump(replacements, f, ensure_ascii=False, indent=4)
 
 
+BLOCK_RE = re.compile(r"\{\{.*?\}\}")
+
+
+class RuleSet:
+    """
+    Скомпилированные правила замены (порядок = приоритет правил, как в JSON);
+    правило для каждого уникального блока {{...}} определяется один раз.
+    """
+
+    def __init__(self, replacements):
+        self.rules = [(re.compile(pattern), repl) for pattern, repl in replacements.items()]
+        self._block_rule = {}
+
+    def rule_for(self, block):
+        """Индекс первого подходящего правила (как в прежнем цикле по JSON) или None"""
+        if block in self._block_rule:
+            return self._block_rule[block]
+        # search, а не match: правило может совпасть в любом месте блока
+        idx = next((i for i, (pattern, _) in enumerate(self.rules) if pattern.search(block)), None)
+        self._block_rule[block] = idx
+        return idx
+
+    def apply(self, text):
+        """
+        Один проход по тексту: каждый блок заменяется своим правилом.
+        Возвращает (текст, неизвестные блоки в виде (block, позиция в исходном тексте)).
+        """
+        parts = []
+        unknown = []
+        pos = 0
+        for m in BLOCK_RE.finditer(text):
+            block = m.group(0)
+            idx = self.rule_for(block)
+            if idx is None:
+                unknown.append((block, m.start()))
+                continue
+            pattern, repl = self.rules[idx]
+            parts.append(text[pos:m.start()])
+            parts.append(pattern.sub(repl, block))
+            pos = m.end()
+        parts.append(text[pos:])
+        return "".join(parts), unknown
+
+
+_compiled_rules = {}  # sha1 содержимого JSON -> RuleSet
+
+
+def load_rules(path=None):
+    """RuleSet для файла замен; компиляция кэшируется по хэшу файла"""
+    path = path or REPLACEMENTS_FILE
+    if not os.path.exists(path):
+        return RuleSet({})
+    with open(path, "rb") as f:
+        data = f.read()
+    key = hashlib.sha1(data).hexdigest()
+    rules = _compiled_rules.get(key)
+    if rules is None:
+        rules = _compiled_rules[key] = RuleSet(json.loads(data.decode("utf-8")))
+    return rules
+
+
 def replace_blocks(text, replacements):
-    # Находим все {{...}}
-    blocks = re.findall(r"(\{\{.*?\}\})", text)
-
-    for block in blocks:
-        replaced = False
-
-        # Проверяем все правила из JSON
-        for pattern, repl in replacements.items():
-            if re.search(pattern, block):
-                text = re.sub(pattern, repl, text)
-                replaced = True
-                break
-
-        # Если замены нет — спросим у пользователя
-        if not replaced:
-            print(f"Неизвестный блок: {block}")
-            # new_repl = input("Введите замену (можно использовать группы вида \\1, \\2): ")
-            # pattern = input("Введите regex-шаблон для этого блока (Enter для точного совпадения): ")
-            # if not pattern.strip():
-            #     pattern = re.escape(block)  # если regex не указан — точное совпадение
-            # replacements[pattern] = new_repl
-            # text = re.sub(pattern, new_repl, text)
-            # save_replacements(replacements)
+    rules = replacements if isinstance(replacements, RuleSet) else RuleSet(replacements)
+    text, unknown = rules.apply(text)
+
+    # Если замены нет — спросим у пользователя
+    for block, _ in unknown:
+        print(f"Неизвестный блок: {block}")
+        # new_repl = input("Введите замену (можно использовать группы вида \\1, \\2): ")
+        # pattern = input("Введите regex-шаблон для этого блока (Enter для точного совпадения): ")
+        # if not pattern.strip():
+        #     pattern = re.escape(block)  # если regex не указан — точное совпадение
+        # replacements[pattern] = new_repl
+        # text = re.sub(pattern, new_repl, text)
+        # save_replacements(replacements)
 
     return text, replacements
 
 
+def convert_file(input_file, output_file, rules):
+    """Конвертирует один файл; возвращает неизвестные блоки: список (block, номер строки)"""
+    with open(input_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    new_text, unknown = rules.apply(text)
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(new_text)
+
+    result = []
+    line, last = 1, 0
+    for block, pos in unknown:
+        line += text.count("\n", last, pos)
+        last = pos
+        result.append((block, line))
+    return result
+
+
+_rules = None
+
+
+def _init_worker(rules):
+    global _rules
+    _rules = rules
+
+
+def _convert_pair(pair):
+    src, dst = pair
+    try:
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        return src, convert_file(src, dst, _rules), None
+    except Exception as e:
+        return src, [], str(e)
+
+
+def convert_batch(input_path, output_dir, processes=None, rules=None):
+    """
+    Конвертирует папку/glob .bpmn параллельно, результаты кладёт в output_dir с той же структурой.
+    Неизвестные блоки собираются по всем файлам: block -> [количество, файл, строка первого вхождения].
+    """
+    rules = rules or load_rules()
+    pairs = [(src, os.path.join(output_dir, rel)) for src, rel in collect_files(input_path, "*.bpmn")]
+    if not pairs:
+        print(f"Не найдено файлов .bpmn: {input_path}")
+        return {}
+    processes = min(processes or os.cpu_count() or 1, len(pairs))
+    if processes == 1:
+        _init_worker(rules)
+        unknown = _collect_batch(map(_convert_pair, pairs))
+    else:
+        # правила компилируются один раз и передаются воркерам при старте
+        with Pool(processes, initializer=_init_worker, initargs=(rules,)) as pool:
+            unknown = _collect_batch(pool.imap(_convert_pair, pairs))
+    report_unknown(unknown)
+    print(f"Готово! Файлов: {len(pairs)}, результаты сохранены в {output_dir}")
+    return unknown
+
+
+def _collect_batch(results):
+    unknown = {}
+    for src, blocks, error in results:
+        if error:
+            print(f"Ошибка: {src}: {error}")
+            continue
+        for block, line in blocks:
+            entry = unknown.get(block)
+            if entry is None:
+                unknown[block] = [1, src, line]
+            else:
+                entry[0] += 1
+    return unknown
+
+
+def report_unknown(unknown):
+    if not unknown:
+        return
+    print(f"Неизвестных блоков: {len(unknown)} (вхождений {sum(e[0] for e in unknown.values())})")
+    for block, (count, path, line) in sorted(unknown.items(), key=lambda kv: -kv[1][0]):
+        print(f"  {count:>5}  {block}  — впервые: {path}:{line}")
+
+
 def main(input_file, output_file):
-    # Загружаем заменители
-    replacements = load_replacements()
+    # input_file может быть папкой или glob-шаблоном — тогда output_file это папка для результатов
+    if is_batch_input(input_file):
+        convert_batch(input_file, output_file)
+        return
+
+    # Загружаем заменители (скомпилированные правила кэшируются по хэшу JSON)
+    replacements = load_rules()
 
     with open(input_file, "r", encoding="utf-8") as f:
         text = f.read()
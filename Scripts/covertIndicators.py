@@ -1,15 +1,27 @@
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from multiprocessing import Pool
+
 from lxml import etree
 
+SHARD_MIN_SIZE = 256 * 1024 * 1024  # файлы больше этого размера конвертируются параллельно по частям
+# вывод побайтно как у прежнего ElementTree.write(..., xml_declaration=True, pretty_print=True)
+XML_DECLARATION = b"<?xml version='1.0' encoding='UTF-8'?>\n"
+
 
-def processing_big_xml(file_path: str, tag_name: list):
+def processing_big_xml(file_path: str, tag_name: list, recover: bool=True):
     """
     Потоково читает большой XML файл и возвращает элементы с заданным тегом.
     
     :param file_path: путь к XML файлу
     :param tag_name: имя тега, который нужно обрабатывать
+    :param recover: пропускать ошибки разметки (для частей файла выключено)
     :yield: элемент etree.Element
     """
-    context = etree.iterparse(file_path, events=("end",), tag=tag_name, recover=True, huge_tree=True)
+    context = etree.iterparse(file_path, events=("end",), tag=tag_name, recover=recover, huge_tree=True)
     
     for event, elem in context:
         yield elem
@@ -24,47 +36,269 @@ def processing_big_xml(file_path: str, tag_name: list):
     del context  # очистить парсер
 
 
+TYPE_MAP = {"0": "CALCULATED", "2": "LAST_DATE", "1": "PROGRESSIVE"}
+
+
+def convert_indicator(indicator):
+    """Indicator старого формата -> новый элемент Indicator с атрибутами"""
+    code = indicator.findtext("Code") or ""
+    description = indicator.findtext("Description") or ""
+    name = indicator.findtext("Name")  or ""
+    mu_code = indicator.findtext("MUCode")  or ""
+    type_val = indicator.findtext("Type") or "0"
+    is_integer = indicator.findtext("IsInteger") == "1"
+    is_system = indicator.findtext("IsSystem") == "1"
+    allow_edit = indicator.findtext("AllowEditValues") == "1"
+
+    return etree.Element("Indicator", {
+        "code": code ,
+        "description": description,
+        "isEditable": str(allow_edit).lower(),
+        "isInteger": str(is_integer).lower(),
+        "isSystem": str(is_system).lower(),
+        "measurementUnit": mu_code,
+        "name": name,
+        "type": TYPE_MAP[type_val]
+    })
+
+
+def write_indicators(out, indicators, codes=None):
+    """Пишет сконвертированные показатели (с отступом) в бинарный файл out, возвращает их количество"""
+    count = 0
+    for indicator in indicators:
+        if codes is not None and (indicator.findtext("Code") or "") not in codes:
+            continue
+        out.write(b"\n  ")
+        out.write(etree.tostring(convert_indicator(indicator), encoding="utf-8"))
+        count += 1
+    return count
+
+
+def finish_document(out, count):
+    """Закрывает Data после показателей; без показателей — пустой <Data/>, как раньше"""
+    if count:
+        out.write(b"\n</Data>\n")
+    else:
+        out.seek(len(XML_DECLARATION))
+        out.truncate()
+        out.write(b"<Data/>\n")
+
+
 def transform_xml(input_file: str, output_file: str, codes: list=None):
     # parser = etree.XMLParser(recover=True, encoding="utf-8")
     # tree = etree.parse(input_file, parser)
     # root = tree.getroot()
 
-    new_root = etree.Element("Data")
+    # множество — проверка кода за O(1)
+    codes = set(codes) if codes is not None else None
 
-    for indicator in processing_big_xml(input_file, "Indicator"):
-        code = indicator.findtext("Code") or ""
+    # результат пишется по мере чтения, дерево в памяти не накапливается
+    with open(output_file, "wb") as out:
+        out.write(XML_DECLARATION + b"<Data>")
+        count = write_indicators(out, processing_big_xml(input_file, "Indicator"), codes)
+        finish_document(out, count)
+    return count
 
-        if codes is not None and code not in codes:
-            continue
-        description = indicator.findtext("Description") or ""
-        name = indicator.findtext("Name")  or ""
-        mu_code = indicator.findtext("MUCode")  or ""
-        type_val = indicator.findtext("Type") or "0"
-        is_integer = indicator.findtext("IsInteger") == "1"
-        is_system = indicator.findtext("IsSystem") == "1"
-        allow_edit = indicator.findtext("AllowEditValues") == "1"
-
-        type_map = {"0": "CALCULATED", "2": "LAST_DATE", "1": "PROGRESSIVE"}
-        type_attr = type_map[type_val]
-
-        new_indicator = etree.Element("Indicator", {
-            "code": code ,
-            "description": description,
-            "isEditable": str(allow_edit).lower(),
-            "isInteger": str(is_integer).lower(),
-            "isSystem": str(is_system).lower(),
-            "measurementUnit": mu_code,
-            "name": name,
-            "type": type_attr
-        })
-
-        new_root.append(new_indicator)
-    # print(codes)
-
-    new_tree = etree.ElementTree(new_root)
-    new_tree.write(output_file, encoding="utf-8", xml_declaration=True, pretty_print=True)
 
+# открывающий тег Indicator (не IndicatorCode и т.п.)
+INDICATOR_RE = re.compile(rb"<Indicator[\s/>]")
+_ATTRS = rb"""(?:[^>"']|"[^"]*"|'[^']*')*?"""
+# конец показателя, за которым идёт не следующий показатель (смена контейнера, хвост файла и т.п.)
+INDICATOR_GAP_RE = re.compile(
+    rb"(?:</Indicator\s*>|<Indicator(?=[\s/])" + _ATTRS + rb"/>)(?!\s*<Indicator[\s/>])")
+TAG_RE = re.compile(
+    rb"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>|<(?P<close>/?)(?P<name>[^\s/>]+)" + _ATTRS + rb"(?P<empty>/?)>",
+    re.S)
 
-def main(input_xml: str, output_xml: str, codes: list=None):
-    transform_xml(input_xml, output_xml, codes)
 
+def _find_indicator(mm, pos, end=None):
+    """Смещение ближайшего открывающего тега <Indicator начиная с pos, или -1"""
+    m = INDICATOR_RE.search(mm, pos, len(mm) if end is None else end)
+    return m.start() if m else -1
+
+
+def _apply_tags(data, stack):
+    """Применяет теги из data (вне показателей) к стеку открытых элементов [(имя, открывающий тег)]"""
+    for m in TAG_RE.finditer(data):
+        name = m.group("name")
+        if name is None:
+            continue  # комментарий, инструкция, CDATA
+        if m.group("close"):
+            if not stack or stack[-1][0] != name:
+                raise ValueError(f"непарный закрывающий тег {name.decode(errors='replace')}")
+            stack.pop()
+        elif not m.group("empty"):
+            stack.append((name, m.group(0)))
+
+
+def find_shards(file_path: str, shards: int):
+    """
+    Быстрый проход по байтам: делит файл на shards диапазонов, каждый начинается с открывающего тега Indicator.
+    Возвращает [(start, end, head, tail)]: head — декларация и настоящие открывающие теги предков
+    (с пространствами имён) на start, tail — закрывающие теги предков на end.
+    Смены контейнеров между показателями (</Indicators><Indicators>) отслеживаются по стеку тегов.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        first = _find_indicator(mm, 0)
+        if first < 0:
+            return []
+
+        starts = [first]
+        step = max((len(mm) - first) // shards, 1)
+        for k in range(1, shards):
+            pos = _find_indicator(mm, max(first + k * step, starts[-1] + 1))
+            if pos < 0:
+                break
+            if pos > starts[-1]:
+                starts.append(pos)
+
+        declaration = b""
+        if mm[:5] == b"<?xml":
+            declaration = mm[:mm.find(b"?>") + 2]
+        stack = []
+        _apply_tags(mm[len(declaration):first], stack)
+        stacks = []  # открытые предки на каждом start
+        k = 0
+        for gap in INDICATOR_GAP_RE.finditer(mm, first):
+            while k < len(starts) and starts[k] < gap.end():
+                stacks.append(list(stack))
+                k += 1
+            nxt = _find_indicator(mm, gap.end())
+            if nxt < 0 or k == len(starts):
+                break
+            _apply_tags(mm[gap.end():nxt], stack)
+        stacks.extend(list(stack) for _ in range(len(starts) - len(stacks)))
+
+        result = []
+        for k, start in enumerate(starts):
+            head = declaration + b"".join(tag for _, tag in stacks[k])
+            if k + 1 < len(starts):
+                end = starts[k + 1]
+                tail = b"".join(b"</" + name + b">" for name, _ in reversed(stacks[k + 1]))
+            else:
+                end, tail = len(mm), b""
+            result.append((start, end, head, tail))
+        return result
+
+
+class _ShardReader:
+    """Файлоподобный объект: head + байты [start, end) исходного файла + tail"""
+
+    def __init__(self, file_path, start, end, head, tail):
+        self.f = open(file_path, "rb")
+        self.f.seek(start)
+        self.left = end - start
+        self.head = head
+        self.tail = tail
+
+    def read(self, size=-1):
+        size = 1 << 20 if size is None or size < 0 else size
+        if self.head:
+            chunk, self.head = self.head[:size], self.head[size:]
+            return chunk
+        if self.left > 0:
+            chunk = self.f.read(min(size, self.left))
+            self.left -= len(chunk)
+            if chunk:
+                return chunk
+            self.left = 0
+        chunk, self.tail = self.tail[:size], self.tail[size:]
+        return chunk
+
+    def close(self):
+        self.f.close()
+
+
+_shard_codes = None
+
+
+def _init_worker(codes):
+    global _shard_codes
+    _shard_codes = codes
+
+
+def _count_tags(file_path, start, end):
+    """Число открывающих тегов Indicator в диапазоне по сырым байтам"""
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return sum(1 for _ in INDICATOR_RE.finditer(mm, start, end))
+
+
+def convert_shard(job):
+    """
+    Конвертирует диапазон файла во фрагмент (без корня) в part_path.
+    Возвращает (разобрано показателей, тегов Indicator в байтах, записано показателей, ошибка разбора или None).
+    Ошибку возвращаем строкой: XMLSyntaxError из lxml не передаётся между процессами (не pickle-ится).
+    """
+    file_path, start, end, head, tail, part_path = job
+    reader = _ShardReader(file_path, start, end, head, tail)
+    seen = 0
+
+    def counted(indicators):
+        nonlocal seen
+        for indicator in indicators:
+            seen += 1
+            yield indicator
+
+    try:
+        with open(part_path, "wb") as out:
+            # без recover: битая часть должна упасть, а не молча потерять показатели
+            indicators = processing_big_xml(reader, "Indicator", recover=False)
+            count = write_indicators(out, counted(indicators), _shard_codes)
+    except etree.XMLSyntaxError as e:
+        return seen, None, 0, str(e)
+    finally:
+        reader.close()
+    return seen, _count_tags(file_path, start, end), count, None
+
+
+def transform_xml_sharded(input_file: str, output_file: str, codes: list=None, processes: int=None):
+    """
+    Параллельная конвертация: файл режется по границам Indicator, части конвертируются в пуле процессов,
+    фрагменты склеиваются в один документ Data (результат тот же, что у transform_xml).
+    Если часть не разобралась или число показателей не сошлось с числом тегов — обычная конвертация.
+    """
+    codes = set(codes) if codes is not None else None
+    processes = processes or os.cpu_count() or 1
+    try:
+        shards = find_shards(input_file, processes)
+    except ValueError as e:
+        print(f"[WARN] Не удалось разбить файл на части ({e}), конвертация в один поток")
+        return transform_xml(input_file, output_file, codes)
+    if len(shards) < 2:
+        return transform_xml(input_file, output_file, codes)
+
+    tmp_dir = tempfile.mkdtemp(prefix="indicators_", dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        jobs = [(input_file, *shard, os.path.join(tmp_dir, f"{num:04d}.part")) for num, shard in enumerate(shards)]
+        with Pool(min(processes, len(jobs)), initializer=_init_worker, initargs=(codes,)) as pool:
+            results = list(pool.imap(convert_shard, jobs))
+        error = next((r[3] for r in results if r[3] is not None), None)
+        if error is not None:
+            print(f"[WARN] Ошибка разбора части файла ({error}), конвертация в один поток")
+            results = None
+        if results is not None:
+            seen = sum(r[0] for r in results)
+            expected = sum(r[1] for r in results)
+            if seen != expected:
+                print(f"[WARN] Разобрано {seen} показателей из {expected}, конвертация в один поток")
+                results = None
+        if results is not None:
+            count = sum(r[2] for r in results)
+            with open(output_file, "wb") as out:
+                out.write(XML_DECLARATION + b"<Data>")
+                for job in jobs:
+                    with open(job[-1], "rb") as part:
+                        shutil.copyfileobj(part, out, 1 << 20)
+                finish_document(out, count)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if results is None:
+        return transform_xml(input_file, output_file, codes)
+    return count
+
+
+def main(input_xml: str, output_xml: str, codes: list=None):
+    if os.path.getsize(input_xml) >= SHARD_MIN_SIZE and (os.cpu_count() or 1) > 1:
+        transform_xml_sharded(input_xml, output_xml, codes)
+    else:
+        transform_xml(input_xml, output_xml, codes)
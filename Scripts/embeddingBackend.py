@@ -0,0 +1,63 @@
+"""
+Общая модель эмбеддингов для ToSnakeCase и OK_creator
+- модель загружается лениво, при первом реальном обращении (попадания в кэш её не грузят)
+- один экземпляр SentenceTransformer на процесс, его же использует KeyBERT
+- режим инференса задаётся переменной окружения SCRIPTS_EMBEDDING_BACKEND:
+    torch      — обычная модель (по умолчанию)
+    onnx       — ONNX Runtime на CPU (нужен sentence-transformers[onnx])
+    onnx-qint8 — квантованная ONNX-модель: быстрее старт и меньше памяти
+"""
+import os
+import threading
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+BACKEND = os.environ.get("SCRIPTS_EMBEDDING_BACKEND", "torch").strip().lower() or "torch"
+ONNX_QINT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# идентификатор модели для ключей кэша: разные режимы дают немного разные эмбеддинги
+MODEL_ID = MODEL_NAME if BACKEND == "torch" else f"{MODEL_NAME}:{BACKEND}"
+
+_model = None
+_kw_model = None
+_lock = threading.Lock()
+
+
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+
+    if BACKEND == "onnx":
+        kwargs = {"backend": "onnx"}
+    elif BACKEND == "onnx-qint8":
+        kwargs = {"backend": "onnx", "model_kwargs": {"file_name": ONNX_QINT8_FILE}}
+    else:
+        kwargs = {}
+    if kwargs:
+        try:
+            return SentenceTransformer(MODEL_NAME, device="cpu", **kwargs)
+        except Exception as e:
+            print(f"⚠️ Не удалось загрузить модель в режиме {BACKEND} ({e}), используется torch")
+    return SentenceTransformer(MODEL_NAME)
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = _load_model()
+    return _model
+
+
+def get_keybert():
+    global _kw_model
+    if _kw_model is None:
+        model = get_model()
+        with _lock:
+            if _kw_model is None:
+                from keybert import KeyBERT
+                _kw_model = KeyBERT(model=model)
+    return _kw_model
+
+
+def extract_keywords(docs, **kwargs):
+    return get_keybert().extract_keywords(docs, **kwargs)
@@ -1,39 +1,18 @@
 import os
-import xml.etree.ElementTree as ET
 from lxml import etree
-import os
 from tqdm import tqdm
-from pathlib import Path
-
-def parse_folder(folder_path, get_full_path=False):
-    """получить название файлов и root всех xml файлов в папке (с прогресс-баром)"""
-    roots = []
-    filenames = []
-
-    xml_files = []
-    for root_dir, _, files in os.walk(folder_path):
-        for filename in files:
-            if filename.lower().endswith(".xml"):
-                xml_files.append(os.path.join(root_dir, filename))
-
-    for file_path in tqdm(xml_files, desc="Парсинг XML", unit="файл"):
-        try:
-            p = Path(file_path).resolve()
-            file_path = "\\\\?\\" + str(p)
-
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            roots.append(root)
-
-            if get_full_path:
-                filenames.append(file_path)
-            else:
-                filenames.append(os.path.basename(file_path))
-
-        except Exception as ex:
-            print(f"Ошибка: {ex} — {file_path}")
+from xmlScanner import XmlQuery, iter_xml_files, scan_folder
+from xmlIndex import open_index
 
-    return roots, filenames
+def parse_folder(folder_path, queries, processes=None):
+    """выполнить запросы по всем xml файлам в папке (с прогресс-баром), отдавая результаты по мере разбора"""
+    xml_files = list(iter_xml_files(folder_path))
+    for res in tqdm(scan_folder(folder_path, queries, processes, files=xml_files),
+                    total=len(xml_files), desc="Парсинг XML", unit="файл"):
+        if res.error:
+            print(f"Ошибка: {res.error} — {res.path}")
+            continue
+        yield res
 
 def print_data(data, to_file=None, mode_file='w'):
     if to_file:
@@ -64,13 +43,28 @@ def print_data(data, to_file=None, mode_file='w'):
                 ))
             
 
-def find_file_by_tag(folder_path, tag, add_filter_tag, names_find=None):
-    roots, filenames = parse_folder(folder_path, True)
-    for num, root in enumerate(roots):
+def find_file_by_tag(folder_path, tag, add_filter_tag, names_find=None, use_index=False):
+    names_find = list(names_find or [])
+    if use_index:
+        with open_index(folder_path) as index:
+            hits = {}
+            for value, path in index.find_values(add_filter_tag or '*', attr=tag, names=names_find):
+                hits.setdefault(path, set()).add(value)
+        for path, values in hits.items():
+            for name in names_find:
+                if name in values:
+                    print(name, path)
+        return
+    if not names_find:
+        return
+    # один обход элементов add_filter_tag на файл, значение атрибута tag ищется во множестве имён
+    query = XmlQuery(f".//{add_filter_tag or '*'}", attr=tag, names=frozenset(names_find))
+    for res in parse_folder(folder_path, [query]):
+        found = {m.value for m in res.matches}
         for name in names_find:
-            if len(root.findall(f".//{add_filter_tag}[@{tag}='{name}']")):
-                print_data(name, filenames[num])
+            if name in found:
+                print(name, res.path)
 
 
-def main(folder_find, tag, names, add_filter_tag=''):
-    find_file_by_tag(folder_find, tag, add_filter_tag, names)
\ No newline at end of file
+def main(folder_find, tag, names, add_filter_tag='', use_index=False):
+    find_file_by_tag(folder_find, tag, add_filter_tag, names, use_index)
\ No newline at end of file
@@ -1,32 +1,16 @@
 import os
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
 from lxml import etree
-import os
-
+from xmlScanner import XmlQuery, scan_folder
+from xmlIndex import open_index
 
-def parse_folder(folder_path, get_full_path=False):
-    """получить название файлов и root всех xml файлов в папке"""
-    roots =[]
-    filenames = []
-    for root_dir, _, files in os.walk(folder_path):
-        for filename in files:
-            if filename.lower().endswith(".xml"):
-                file_path = os.path.join(root_dir, filename)
-                try:
-                    if len(file_path) > 260:
-                        file_path = r"\\?\{}".format(file_path)
-                    tree = ET.parse(file_path)
-                    root = tree.getroot()
-                    roots.append(root)
-                    if get_full_path:
-                        filenames.append(file_path)
-                    else:
-                        filenames.append(filename)
-                except Exception as ex:
-                    print(ex)
-    return roots, filenames
 
+def parse_folder(folder_path, queries, processes=None):
+    """выполнить запросы по всем xml файлам в папке, отдавая результаты по мере разбора"""
+    for res in scan_folder(folder_path, queries, processes):
+        if res.error:
+            print(res.error)
+            continue
+        yield res
 
 
 def print_data(data, to_file=None, mode_file='w'):
@@ -59,63 +43,65 @@ def print_data(data, to_file=None, mode_file='w'):
             )
 
 
-def find_ind_code_in_rules(folder_path, get_rule=False, names_find=None, to_file=None):
+def find_ind_code_in_rules(folder_path, get_rule=False, names_find=None, to_file=None, use_index=False):
     """Найти все коды показателей и файлы показателей в файлах правил расчёта показателей"""
-    roots, filenames = parse_folder(folder_path, True)
-    for num, root in enumerate(roots):
-        if not get_rule:
-            for entity in root.findall(".//IndicatorCode"):
-                code = entity.text
-                if not names_find:
-                    print(code, filenames[num])
-                elif code in names_find:
-                    print(code, filenames[num])
-        else:
-            for entity in root.findall(".//StoredMeasureCalculationRules"):
-                codes = entity.findall(".//IndicatorCode")
-                
+    names = frozenset(names_find) if names_find else None
+    if use_index and not get_rule:
+        # правила целиком (get_rule) в индексе не хранятся — для них обычный обход
+        with open_index(folder_path) as index:
+            for code, path in index.find_values("IndicatorCode", names=names):
+                print(code, path)
+        return
+    if not get_rule:
+        query = XmlQuery(".//IndicatorCode", names=names)
+    else:
+        query = XmlQuery(".//StoredMeasureCalculationRules", inner=".//IndicatorCode", names=names, element=True)
+    for res in parse_folder(folder_path, [query]):
+        for m in res.matches:
+            if not get_rule:
+                print(m.value, res.path)
+            else:
+                if m.value is not None:
+                    print_data(f'{m.value}')
+                print_data(m.element, to_file=to_file, mode_file='a')
+
+
+def find_ind_code_in_inds(folder_path, names_find=None, use_index=False):
+    """Найти все коды показателей и файлы показателей в файлах показателей"""
+    names = frozenset(names_find) if names_find else None
+    if use_index:
+        with open_index(folder_path) as index:
+            for code, path in index.find_values("Indicator", attr="code", names=names):
                 if not names_find:
-                    print_data(entity, to_file=to_file, mode_file='a')
-                    print_data(f'{code}')
+                    print(code)
                 else:
-                    for code in codes:
-                        if code.text in names_find:
-                            print_data(f'{code.text}')
-                            print_data(entity, to_file=to_file, mode_file='a')
-                            break
-
-
-def find_ind_code_in_inds(folder_path, names_find=None):
-    """Найти все коды показателей и файлы показателей в файлах показателей"""
-    roots, filenames = parse_folder(folder_path, True)
-    for num, root in enumerate(roots):
-        for entity in root.findall(".//Indicator"):
-            code = entity.get('code')
+                    print(code, path)
+        return
+    for res in parse_folder(folder_path, [XmlQuery(".//Indicator", attr="code", names=names)]):
+        for m in res.matches:
             if not names_find:
-                print(code)
-            elif code in names_find:
-                print(code, filenames[num])
+                print(m.value)
+            else:
+                print(m.value, res.path)
 
 def find_uniq_ind_mu_in_inds(folder_path):
     """Найти все уникальные коды единиц измерения для показателей в файлах показателей"""
-    roots, filenames = parse_folder(folder_path)
     measurements_unit = set()
-    for num, root in enumerate(roots):
-        for entity in root.findall(".//Indicator"):
-            mu = entity.get('measurementUnit')
-            measurements_unit.add(mu)
+    for res in parse_folder(folder_path, [XmlQuery(".//Indicator", attr="measurementUnit")]):
+        measurements_unit.update(m.value for m in res.matches)
     print(measurements_unit)
 
 
-def find_queries(folder_path,  names_find=None):
-    roots, filenames = parse_folder(folder_path, True)
-    for num, root in enumerate(roots):
-        for entity in root.findall('.//EntityQuery/Code'):
-            code = entity.text
-            for name in names_find:
-                if code == name:
-                    print(code, filenames[num])
-                    break
+def find_queries(folder_path,  names_find=None, use_index=False):
+    names = frozenset(names_find or ())
+    if use_index:
+        with open_index(folder_path) as index:
+            for code, path in index.find_values("Code", parent="EntityQuery", names=names):
+                print(code, path)
+        return
+    for res in parse_folder(folder_path, [XmlQuery(".//EntityQuery/Code", names=names)]):
+        for m in res.matches:
+            print(m.value, res.path)
 
 
 if __name__ == "__main__":
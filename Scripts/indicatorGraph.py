@@ -0,0 +1,156 @@
+"""
+Граф зависимостей расчётных показателей
+- строится один раз по описаниям показателей (code -> Indicator)
+- раскрытие формул и наборы базовых кодов мемоизируются по узлам
+- циклы находятся заранее (компоненты сильной связности) и не раскрываются
+"""
+import re
+
+REF_RE = re.compile(r"\bi(\d+)\b")
+
+
+class Indicator:
+    """Компактная запись показателя: только тип и формула"""
+    __slots__ = ("type", "expr")
+
+    def __init__(self, type, expr):
+        self.type = type
+        self.expr = expr
+
+    def __repr__(self):
+        return f"Indicator({self.type!r}, {self.expr!r})"
+
+
+class IndicatorGraph:
+    def __init__(self, indicators):
+        """indicators: mapping code -> объект с полями type и expr"""
+        self.indicators = indicators
+        self.deps = {}
+        for code, ind in indicators.items():
+            if ind.type == "CALCULATED" and ind.expr:
+                self.deps[code] = list(dict.fromkeys(REF_RE.findall(ind.expr)))
+        self.cycles = self._find_cycles()
+        self._cycle_of = {m: frozenset(members) for members in self.cycles for m in members}
+        self._formulas = {}
+        self._bases = {}
+
+    def is_base(self, code):
+        """Базовый показатель: известен и не является расчётным (с формулой)"""
+        return code in self.indicators and code not in self.deps
+
+    def missing(self):
+        """Коды, на которые ссылаются формулы, но которых нет среди показателей"""
+        return sorted({r for refs in self.deps.values() for r in refs if r not in self.indicators})
+
+    def _find_cycles(self):
+        """Тарьян (итеративно): компоненты сильной связности, образующие циклы"""
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+        for start in self.deps:
+            if start in index:
+                continue
+            work = [(start, iter(self.deps.get(start, ())))]
+            index[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, children = work[-1]
+                advanced = False
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.deps.get(child, ()))))
+                        advanced = True
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    if len(members) > 1 or node in self.deps.get(node, ()):
+                        cycles.append(sorted(members))
+        return cycles
+
+    def _same_component(self, a, b):
+        return b in self._cycle_of.get(a, ())
+
+    def _compute(self, root):
+        stack = [(root, False)]
+        while stack:
+            code, ready = stack.pop()
+            if code in self._formulas:
+                continue
+            children = [r for r in self.deps.get(code, ()) if not self._same_component(code, r)]
+            if not ready:
+                stack.append((code, True))
+                stack.extend((r, False) for r in children if r not in self._formulas)
+                continue
+            if code not in self.deps:
+                self._formulas[code] = "i" + code
+                self._bases[code] = frozenset([code]) if code in self.indicators else frozenset()
+                continue
+            if code in self._cycle_of:
+                bases = self._component_bases(code)
+            else:
+                bases = frozenset().union(*(self._bases[r] for r in children))
+
+            def substitute(m, code=code):
+                ref = m.group(1)
+                if self._same_component(code, ref):
+                    return f"(i{ref})"  # ссылка внутри цикла — не раскрываем
+                return f"({self._formulas[ref]})"
+
+            self._formulas[code] = REF_RE.sub(substitute, self.indicators[code].expr)
+            self._bases[code] = bases
+
+    def _component_bases(self, code):
+        """Базовые коды цикла: объединение по внешним зависимостям всех его участников"""
+        members = self._cycle_of[code]
+        external = [r for m in members for r in self.deps[m] if not self._same_component(code, r)]
+        for r in external:
+            self._compute(r)
+        return frozenset().union(*(self._bases[r] for r in external))
+
+    def expand(self, code):
+        """Раскрытая формула и множество базовых кодов показателя"""
+        if code not in self._formulas:
+            self._compute(code)
+        return self._formulas[code], self._bases[code]
+
+    def topological_order(self):
+        """Расчётные показатели в порядке зависимостей (сначала те, от кого зависят)"""
+        order = []
+        seen = set()
+        for start in self.deps:
+            stack = [(start, False)]
+            while stack:
+                code, ready = stack.pop()
+                if ready:
+                    order.append(code)
+                    continue
+                if code in seen or code not in self.deps:
+                    continue
+                seen.add(code)
+                stack.append((code, True))
+                stack.extend((r, False) for r in reversed(self.deps[code])
+                             if r not in seen and not self._same_component(code, r))
+        return order
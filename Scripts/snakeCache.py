@@ -0,0 +1,122 @@
+"""
+Постоянный кэш результатов генерации кодов (перевод, snake_case) для ToSnakeCase и OK_creator
+- хранится в SQLite, размер ограничен (вытеснение давно не использованных записей — LRU)
+- ключ: вид операции + модель + нормализованный текст (+ доп. параметры)
+- считает попадания/промахи
+- отметки использования копятся в памяти и пишутся пачкой, а не коммитом на каждое попадание
+"""
+import atexit
+import functools
+import os
+import sqlite3
+
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".scriptsManager", "snake_cache.sqlite")
+MAX_ENTRIES = 50000
+FLUSH_EVERY = 256  # сколько отметок использования копить до записи в базу
+
+
+def normalize(text):
+    return " ".join(text.split()).casefold()
+
+
+class SnakeCache:
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache(used)")
+        self.conn.commit()
+        self._clock, self._count = self.conn.execute(
+            "SELECT COALESCE(MAX(used), 0), COUNT(*) FROM cache").fetchone()
+        self._touched = {}  # key -> used, ещё не записанные в базу
+        atexit.register(self.close)
+
+    @staticmethod
+    def make_key(kind, model, text, *extra):
+        return "|".join([kind, model, normalize(text), *map(str, extra)])
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, key):
+        row = self.conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = self._tick()
+        if len(self._touched) >= FLUSH_EVERY:
+            self.flush()
+        return row[0]
+
+    def flush(self):
+        """Записывает накопленные отметки использования"""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        with self.conn:
+            self.conn.executemany("UPDATE cache SET used = ? WHERE key = ?",
+                                  [(used, key) for key, used in touched.items()])
+
+    def set(self, key, value):
+        self._touched.pop(key, None)
+        self.flush()  # перед вытеснением порядок LRU в базе должен быть актуальным
+        with self.conn:
+            exists = self.conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO cache (key, value, used) VALUES (?, ?, ?)",
+                              (key, value, self._tick()))
+            if exists is None:
+                self._count += 1
+            self._evict()
+
+    def _evict(self):
+        if self._count > self.max_entries:
+            # удаляем с запасом, чтобы не чистить на каждой вставке
+            excess = self._count - self.max_entries + self.max_entries // 10
+            cur = self.conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used LIMIT ?)", (excess,))
+            self._count -= cur.rowcount
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+        atexit.unregister(self.close)
+
+    def memoize(self, kind, model):
+        """Декоратор для f(text, *extra) -> str; исключения и пустые результаты не кэшируются"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(text, *extra):
+                key = self.make_key(kind, model, text, *extra)
+                value = self.get(key)
+                if value is None:
+                    value = func(text, *extra)
+                    if value:
+                        self.set(key, value)
+                return value
+            return wrapper
+        return decorator
+
+    def stats(self):
+        size = self._count
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+        }
+
+    def print_stats(self):
+        st = self.stats()
+        print(f"Кэш кодов: попаданий {st['hits']}, промахов {st['misses']} "
+              f"({st['hit_rate']:.0%}), записей {st['size']}")
@@ -0,0 +1,219 @@
+"""
+Локальный SQLite-индекс репозитория XML-конфигураций
+- files: путь, mtime, размер, sha1 содержимого
+- elements: (tag, parent, attr, value) — атрибуты всех элементов и текст листовых элементов (attr = '')
+- query_sql: текст тегов QuerySQL
+Обновление инкрементальное: переразбираются только файлы с изменившимися mtime/размером (и хэшем).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+from xmlScanner import iter_xml_files, long_path
+
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".scriptsManager", "xml_index")
+MAX_TEXT_LEN = 512  # длинные тексты (кроме QuerySQL) в индекс не попадают
+SCHEMA_VERSION = 2  # при смене формата данных индекс перестраивается с нуля
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    hash TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS elements (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    parent TEXT,
+    attr TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS query_sql (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS elements_tag_attr_value ON elements(tag, attr, value);
+CREATE INDEX IF NOT EXISTS elements_attr_value ON elements(attr, value);
+CREATE INDEX IF NOT EXISTS elements_file ON elements(file_id);
+CREATE INDEX IF NOT EXISTS query_sql_file ON query_sql(file_id);
+"""
+
+
+def default_db_path(folder_path):
+    key = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{key}.sqlite")
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(long_path(path), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def extract(path):
+    """Разбирает файл: (path, hash, rows элементов, тексты QuerySQL, ошибка)"""
+    try:
+        digest = file_hash(path)
+        root = ET.parse(long_path(path)).getroot()
+    except Exception as ex:
+        return path, None, [], [], str(ex)
+    rows = []
+    queries = []
+    stack = [(root, None)]
+    while stack:
+        elem, parent = stack.pop()
+        tag = elem.tag
+        for attr, value in elem.attrib.items():
+            rows.append((tag, parent, attr, value))
+        if tag == "QuerySQL":
+            queries.append(elem.text or "")
+        elif len(elem) == 0 and elem.text:
+            # текст хранится как есть (без strip) — так же его сравнивает обход через xmlScanner
+            text = elem.text
+            if text.strip() and len(text) <= MAX_TEXT_LEN:
+                rows.append((tag, parent, "", text))
+        stack.extend((child, tag) for child in reversed(elem))
+    return path, digest, rows, queries, None
+
+
+class XmlIndex:
+    def __init__(self, folder_path, db_path=None):
+        self.folder_path = folder_path
+        self.db_path = db_path or default_db_path(folder_path)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS query_sql; DROP TABLE IF EXISTS elements; DROP TABLE IF EXISTS files;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def refresh(self, processes=None):
+        """Синхронизирует индекс с папкой; возвращает статистику изменений"""
+        known = {path: (fid, mtime, size, digest)
+                 for fid, path, mtime, size, digest in self.conn.execute(
+                     "SELECT id, path, mtime_ns, size, hash FROM files")}
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        changed = []
+        seen = set()
+        for path in iter_xml_files(self.folder_path):
+            seen.add(path)
+            try:
+                st = os.stat(long_path(path))
+            except OSError:
+                continue
+            old = known.get(path)
+            if old and old[1] == st.st_mtime_ns and old[2] == st.st_size:
+                stats["unchanged"] += 1
+                continue
+            changed.append((path, st.st_mtime_ns, st.st_size))
+
+        with self.conn:
+            for path in set(known) - seen:
+                self.conn.execute("DELETE FROM files WHERE id = ?", (known[path][0],))
+                stats["removed"] += 1
+
+            meta = {path: (mtime, size) for path, mtime, size in changed}
+            for path, digest, rows, queries, error in self._extract_all([p for p, _, _ in changed], processes):
+                mtime, size = meta[path]
+                old = known.get(path)
+                if old and digest is not None and old[3] == digest:
+                    # содержимое не изменилось (например, файл просто "тронули")
+                    self.conn.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?", (mtime, size, old[0]))
+                    stats["unchanged"] += 1
+                    continue
+                if old:
+                    self.conn.execute("DELETE FROM files WHERE id = ?", (old[0],))
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+                fid = self.conn.execute(
+                    "INSERT INTO files (path, mtime_ns, size, hash, error) VALUES (?, ?, ?, ?, ?)",
+                    (path, mtime, size, digest, error)).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO elements (file_id, tag, parent, attr, value) VALUES (?, ?, ?, ?, ?)",
+                    ((fid, *row) for row in rows))
+                self.conn.executemany(
+                    "INSERT INTO query_sql (file_id, text) VALUES (?, ?)", ((fid, q) for q in queries))
+        return stats
+
+    def _extract_all(self, paths, processes):
+        processes = processes or os.cpu_count() or 1
+        if processes == 1 or len(paths) < 2:
+            yield from map(extract, paths)
+            return
+        with Pool(processes) as pool:
+            yield from pool.imap(extract, paths, chunksize=8)
+
+    # --- запросы ---
+
+    def errors(self):
+        """Файлы, которые не удалось разобрать: (path, error)"""
+        return self.conn.execute("SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path").fetchall()
+
+    def find_values(self, tag, attr=None, names=None, parent=None):
+        """
+        Значения атрибута attr (или текста, если attr=None) у элементов tag: список (value, path).
+        names — оставить только эти значения; parent — тег родителя (для путей вида EntityQuery/Code).
+        tag='*' — элементы с любым тегом.
+        """
+        sql = ("SELECT e.value, f.path FROM elements e JOIN files f ON f.id = e.file_id "
+               "WHERE e.attr = ?")
+        params = [attr or ""]
+        if tag != "*":
+            sql += " AND e.tag = ?"
+            params.append(tag)
+        if parent:
+            sql += " AND e.parent = ?"
+            params.append(parent)
+        if names is not None:
+            names = set(names)
+            if not names:
+                return []
+            # имена — через временную таблицу: IN (?, ...) упирается в лимит переменных SQLite (999 в старых сборках)
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS find_names (value TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM temp.find_names")
+            self.conn.executemany("INSERT INTO temp.find_names (value) VALUES (?)", ((n,) for n in names))
+            sql += " AND e.value IN (SELECT value FROM temp.find_names)"
+        sql += " ORDER BY f.path, e.rowid"
+        return self.conn.execute(sql, params).fetchall()
+
+    def find_query_sql(self, search_text, regex=False):
+        """Файлы, в которых текст QuerySQL содержит search_text (или совпадает с регуляркой при regex=True)"""
+        if regex:
+            pattern = re.compile(search_text)
+            # оператор REGEXP в SQLite вызывает regexp(шаблон, значение)
+            self.conn.create_function("regexp", 2, lambda _, text: text is not None and pattern.search(text) is not None)
+            condition = "q.text REGEXP ?"
+        else:
+            condition = "instr(q.text, ?) > 0"
+        return [path for (path,) in self.conn.execute(
+            "SELECT DISTINCT f.path FROM query_sql q JOIN files f ON f.id = q.file_id "
+            f"WHERE {condition} ORDER BY f.path", (search_text,))]
+
+
+def open_index(folder_path, db_path=None, processes=None):
+    """Открывает индекс папки и подтягивает изменения"""
+    index = XmlIndex(folder_path, db_path)
+    stats = index.refresh(processes)
+    print(f"Индекс XML: +{stats['added']} ~{stats['updated']} -{stats['removed']} (без изменений {stats['unchanged']})")
+    return index
@@ -0,0 +1,88 @@
+"""
+Предфильтр XML-файлов по сырым байтам (до разбора)
+- файл отображается в память (mmap), ищутся все искомые литералы за один проход
+- Ахо–Корасик через пакет pyahocorasick, если он установлен, иначе одна регулярка-альтернатива
+- литерал ищется в вариантах utf-8/cp1251 и с XML-экранированием
+Значения, записанные в файле числовыми ссылками (&#1058;...), предфильтр не увидит.
+"""
+import mmap
+import os
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+CHUNK_SIZE = 1 << 22  # окно для Ахо–Корасика (работает по строкам, а не по mmap)
+
+
+def literal_needles(literal):
+    """Байтовые варианты литерала: как есть и с XML-экранированием (в т.ч. кавычек), в utf-8 и cp1251"""
+    escaped = literal.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    quot = escaped.replace('"', "&quot;")
+    needles = set()
+    for text in (literal, escaped, quot, escaped.replace("'", "&apos;"), quot.replace("'", "&apos;")):
+        for encoding in ("utf-8", "cp1251"):
+            try:
+                needles.add(text.encode(encoding))
+            except UnicodeEncodeError:
+                pass
+    return needles
+
+
+class Prefilter:
+    def __init__(self, literals):
+        self.literals = frozenset(l for l in literals if l)
+        self._needles = {}  # needle -> литерал
+        for literal in sorted(self.literals):
+            for needle in literal_needles(literal):
+                self._needles.setdefault(needle, literal)
+        self._max_len = max(map(len, self._needles), default=0)
+        if ahocorasick is not None and self._needles:
+            self._automaton = ahocorasick.Automaton()
+            for needle, literal in self._needles.items():
+                # байты -> str один к одному, чтобы искать в окне, декодированном как latin-1
+                self._automaton.add_word(needle.decode("latin-1"), literal)
+            self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._automaton = None
+            alternatives = sorted(self._needles, key=len, reverse=True)
+            self._regex = re.compile(b"|".join(map(re.escape, alternatives))) if alternatives else None
+
+    @classmethod
+    def for_queries(cls, queries):
+        """Предфильтр по значениям names запросов; None, если хотя бы один запрос без names"""
+        literals = set()
+        for query in queries:
+            if not query.names:
+                return None
+            literals.update(query.names)
+        return cls(literals)
+
+    def search(self, data):
+        """Множество литералов, встречающихся в data (bytes или mmap)"""
+        found = set()
+        if self._automaton is not None:
+            step = CHUNK_SIZE
+            overlap = self._max_len - 1
+            for start in range(0, len(data), step):
+                window = data[start:start + step + overlap].decode("latin-1")
+                for _, literal in self._automaton.iter(window):
+                    found.add(literal)
+                if len(found) == len(self.literals):
+                    break
+        elif self._regex is not None:
+            for m in self._regex.finditer(data):
+                found.add(self._needles[m.group(0)])
+                if len(found) == len(self.literals):
+                    break
+        return found
+
+    def search_file(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return set()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.search(mm)
@@ -0,0 +1,147 @@
+"""
+Общий движок обхода папок с XML (для findConfigs, findIndicators и т.д.)
+- обход дерева через os.scandir (без предварительного списка корней в памяти)
+- файлы разбираются в пуле процессов, запросы (XmlQuery) выполняются сразу по файлу
+- наружу отдаются только совпадения (FileResult), деревья не накапливаются
+- если у всех запросов заданы names, файлы сначала проверяются предфильтром по сырым байтам (xmlPrefilter):
+  файлы без искомых значений не разбираются, запросы — только по значениям, найденным в файле
+"""
+import os
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+from typing import NamedTuple, Optional
+
+from xmlPrefilter import Prefilter
+
+
+class XmlQuery(NamedTuple):
+    path: str                          # ElementPath от корня, например ".//IndicatorCode" или ".//EntityQuery/Code"
+    attr: Optional[str] = None         # брать значение атрибута вместо текста элемента
+    names: Optional[frozenset] = None  # оставить только эти значения (None — все)
+    inner: Optional[str] = None        # значения брать у вложенных элементов (например ".//IndicatorCode")
+    element: bool = False              # вернуть найденный элемент целиком (строкой XML)
+
+
+class Match(NamedTuple):
+    query: int                 # индекс запроса в переданном списке
+    value: Optional[str]
+    element: Optional[str] = None
+
+
+class FileResult(NamedTuple):
+    path: str
+    matches: list
+    error: Optional[str] = None
+
+
+def long_path(path):
+    """На Windows длинные пути (>260) открываются только с префиксом \\\\?\\"""
+    if os.name == "nt" and len(path) >= 260 and not path.startswith("\\\\?\\"):
+        return "\\\\?\\" + os.path.abspath(path)
+    return path
+
+
+def iter_xml_files(folder_path):
+    """Рекурсивно перечисляет xml-файлы папки"""
+    stack = [folder_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(long_path(current)) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as ex:
+            print(f"Ошибка: {ex} — {current}")
+            continue
+        dirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(os.path.join(current, entry.name))
+            elif entry.name.lower().endswith(".xml"):
+                yield os.path.join(current, entry.name)
+        stack.extend(reversed(dirs))
+
+
+def evaluate(root, query):
+    """Выполняет один запрос над корнем документа, возвращает список (value, element_xml)"""
+    result = []
+    for elem in root.iterfind(query.path):
+        if query.inner:
+            values = [e.get(query.attr) if query.attr else e.text for e in elem.iterfind(query.inner)]
+        else:
+            values = [elem.get(query.attr) if query.attr else elem.text]
+        if query.names is not None:
+            values = [v for v in values if v in query.names]
+        elif query.inner and not values:
+            values = [None]
+        if not values:
+            continue
+        xml = ET.tostring(elem, encoding="unicode") if query.element else None
+        if query.inner:
+            # элемент отдаём один раз, по первому подходящему значению
+            result.append((values[0], xml))
+        else:
+            result.extend((v, xml) for v in values)
+    return result
+
+
+def narrow_queries(queries, found):
+    """Оставляет в names запросов только найденные предфильтром значения; None — запрос не нужен"""
+    result = []
+    for query in queries:
+        names = query.names & found
+        result.append(query._replace(names=frozenset(names)) if names else None)
+    return result
+
+
+def scan_file(path, queries, prefilter=None):
+    if prefilter is not None:
+        try:
+            found = prefilter.search_file(long_path(path))
+        except OSError as ex:
+            return FileResult(path, [], str(ex))
+        queries = narrow_queries(queries, found)
+        if not any(queries):
+            return FileResult(path, [])
+    try:
+        root = ET.parse(long_path(path)).getroot()
+    except Exception as ex:
+        return FileResult(path, [], str(ex))
+    matches = []
+    for num, query in enumerate(queries):
+        if query is None:
+            continue
+        for value, xml in evaluate(root, query):
+            matches.append(Match(num, value, xml))
+    return FileResult(path, matches)
+
+
+_queries = None
+_prefilter = None
+
+
+def _init_worker(queries, prefilter):
+    global _queries, _prefilter
+    _queries = queries
+    _prefilter = prefilter
+
+
+def _scan_file_in_worker(path):
+    return scan_file(path, _queries, _prefilter)
+
+
+def scan_folder(folder_path, queries, processes=None, files=None, prefilter=True):
+    """
+    Генератор FileResult по всем xml-файлам папки (в порядке обхода).
+    processes=1 — без пула процессов; files — готовый список файлов (например, для прогресс-бара).
+    prefilter=False — разбирать все файлы без предварительной проверки байтов.
+    """
+    queries = list(queries)
+    prefilter = Prefilter.for_queries(queries) if prefilter else None
+    files = iter_xml_files(folder_path) if files is None else files
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for path in files:
+            yield scan_file(path, queries, prefilter)
+        return
+    with Pool(processes, initializer=_init_worker, initargs=(queries, prefilter)) as pool:
+        yield from pool.imap(_scan_file_in_worker, files, chunksize=8)
@@ -0,0 +1,177 @@
+"""
+Запуск скриптов из реестра без GUI — для CI и cron
+  python cli.py list
+  python cli.py search <текст> [--desc] [--code]
+  python cli.py run <id|название> --param имя=значение ... [--priority N]
+  python cli.py run <id|название> --table params.csv     (пакетный запуск по таблице)
+  python cli.py serve [--host 127.0.0.1] [--port 8765] [--token T]   (HTTP API, см. server.py)
+Значения параметров задаются так же, как в окне запуска (списки — через запятую).
+"""
+
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+
+from runner import DB_FILE, JOB_DONE, JobScheduler, RunHistory, ScriptManager, WorkerPool, load_param_table, make_job
+
+# по умолчанию — реестр рядом с main.py, а не в текущей папке (cron запускает из произвольной)
+DEFAULT_DB = DB_FILE if os.path.exists(DB_FILE) else str(Path(__file__).resolve().parent / DB_FILE)
+
+
+def parse_params(items):
+    values = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Параметр должен быть в виде имя=значение: {item}")
+        values[name.strip()] = value.strip()
+    return values
+
+
+def exit_status(job):
+    """Код выхода CLI по задаче: 0 — успех, код скрипта — если он положительный, иначе 1"""
+    if job.state == JOB_DONE:
+        return 0
+    return job.exit_code if isinstance(job.exit_code, int) and job.exit_code > 0 else 1
+
+
+def cmd_list(manager, args):
+    for s in manager.scripts:
+        print(f"{s.get('id')}\t{s.get('language', 'python')}\t{s.get('mode', 'script')}\t{s.get('name')}")
+    return 0
+
+
+def cmd_search(manager, args):
+    for s in manager.search(args.query, search_name=True, search_desc=args.desc, search_code=args.code):
+        print(f"{s.get('id')}\t{s.get('name')}")
+    return 0
+
+
+def _start(scheduler, script, values, priority, on_output):
+    done = threading.Event()
+    job = make_job(script, values, priority=priority, on_output=on_output, on_finish=lambda j: done.set())
+    scheduler.submit(job)
+    return job, done
+
+
+def _wait(scheduler, jobs):
+    try:
+        for job, done in jobs:
+            while not done.wait(0.5):
+                pass
+    except KeyboardInterrupt:
+        for job, _ in jobs:
+            scheduler.cancel(job.id)
+        for _, done in jobs:
+            done.wait(5)
+
+
+def cmd_run(manager, args):
+    script = manager.get(args.script)
+    if script is None:
+        print(f"Скрипт не найден: {args.script}", file=sys.stderr)
+        return 2
+    known = {p["name"] for p in script.get("params", [])}
+    try:
+        values = parse_params(args.param)
+        unknown = sorted(set(values) - known)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {', '.join(unknown)}")
+        rows = load_param_table(args.table, script) if args.table else [values]
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+
+    pool = WorkerPool(args.jobs)
+    scheduler = JobScheduler(pool, RunHistory(), max_total=args.jobs or pool.size)
+    try:
+        if not args.table:
+            # одиночный запуск: вывод сразу в stdout
+            try:
+                job, done = _start(scheduler, script, values, args.priority,
+                                   lambda text: (sys.stdout.write(text), sys.stdout.flush()))
+            except ValueError as e:
+                print(f"Ошибка: {e}", file=sys.stderr)
+                return 2
+            _wait(scheduler, [(job, done)])
+            return exit_status(job)
+
+        # пакет: вывод строки печатается целиком, когда она завершится
+        started = []
+        lock = threading.Lock()
+        for num, row in enumerate(rows, 1):
+            # значения из --param переопределяют столбцы таблицы
+            row = dict(row, **values)
+            output = []
+
+            def report(job, num=num, output=output):
+                with lock:
+                    print(f"===== [{num}/{len(rows)}] {job.state}, код {job.exit_code} =====")
+                    sys.stdout.write("".join(output))
+                    sys.stdout.flush()
+
+            try:
+                job = make_job(script, row, priority=args.priority, on_output=output.append)
+            except ValueError as e:
+                print(f"===== [{num}/{len(rows)}] ошибка параметров: {e} =====")
+                started.append(None)
+                continue
+            done = threading.Event()
+            job.on_finish = lambda j, report=report, done=done: (report(j), done.set())
+            scheduler.submit(job)
+            started.append((job, done))
+        _wait(scheduler, [item for item in started if item])
+        failed = sum(1 for item in started if item is None or item[0].state != JOB_DONE)
+        print(f"Готово: {len(rows) - failed} из {len(rows)}, с ошибками {failed}")
+        return 1 if failed else 0
+    finally:
+        pool.shutdown()
+
+
+def cmd_serve(manager, args):
+    import server
+    server.serve(manager, host=args.host, port=args.port, max_jobs=args.jobs,
+                 token=args.token or os.environ.get("SCRIPTS_API_TOKEN"))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Script Manager без GUI")
+    parser.add_argument("--db", default=DEFAULT_DB, help="файл реестра скриптов (scripts.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="список скриптов").set_defaults(func=cmd_list)
+
+    p = sub.add_parser("search", help="поиск скриптов")
+    p.add_argument("query")
+    p.add_argument("--desc", action="store_true", help="искать и в описании")
+    p.add_argument("--code", action="store_true", help="искать и в коде")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("run", help="запустить скрипт")
+    p.add_argument("script", help="id или название скрипта")
+    p.add_argument("--param", "-p", action="append", metavar="ИМЯ=ЗНАЧЕНИЕ")
+    p.add_argument("--table", help="CSV/JSON с наборами параметров (пакетный запуск)")
+    p.add_argument("--priority", type=int, default=0)
+    p.add_argument("--jobs", "-j", type=int, default=None, help="одновременных запусков")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("serve", help="локальный HTTP API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--jobs", "-j", type=int, default=None, help="одновременных запусков")
+    p.add_argument("--token", help="токен доступа (или SCRIPTS_API_TOKEN); по умолчанию — новый при каждом запуске")
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manager = ScriptManager(args.db)
+    return args.func(manager, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
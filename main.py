@@ -4,95 +4,80 @@ Script Manager — tkinter (OOП)
 - Treeview с колонками: Название | Язык | Режим
 - Фильтрация по столбцам и сортировка по клику на заголовок
 - Модальный диалог добавления скрипта (с параметрами)
-- Запуск скрипта: режим script (CLI args) или function (вызывает main в модуле через подпроцесс)
+- Запуск скрипта: режим script (CLI args) или function (вызывает main в модуле в пуле "тёплых" воркеров)
 - Окно запуска содержит "консоль" с выводом процесса в реальном времени
+- История запусков (время, CPU, пиковая память, код выхода) с p50/p95 по скриптам
+- Все запуски идут через очередь задач: приоритеты, лимиты одновременных запусков, отмена/остановка
+- Пакетный запуск: один скрипт по таблице наборов параметров (CSV/JSON) со статусом и выводом по строкам
+- Логика без GUI (реестр, воркеры, сборка аргументов, очередь задач) — в runner.py; консоль и HTTP API — cli.py
 """
 
-from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import subprocess
 import os
 import sys
-import json
+import time
+import queue
 import threading
-import uuid
-import shlex
-
-DB_FILE = "scripts.json"
+from collections import deque
+
+from runner import (
+    JOB_CANCELLED, JOB_FAILED, JOB_FINISHED, JOB_KILLED, LANGUAGES,
+    JobScheduler, RunHistory, ScriptManager, WorkerPool, load_param_table, make_job, save_json,
+    script_path,
+)
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".scriptsManager", "logs")
+
+CONSOLE_MAX_LINES = 5000        # строк в консоли окна запуска, старые обрезаются
+CONSOLE_POLL_MS = 50            # период выгрузки очереди вывода в консоль
+CONSOLE_BATCH_CHARS = 256 * 1024  # не больше стольких символов за один тик
+
+PRIORITIES = {"Низкий": -1, "Обычный": 0, "Высокий": 1}
+
+
+def write_console(console, text):
+    """Дописывает текст в консоль (Text), оставляя не больше CONSOLE_MAX_LINES последних строк"""
+    if text.count("\n") > CONSOLE_MAX_LINES:
+        # всё равно будет обрезано — вставляем только хвост
+        text = "\n".join(text.split("\n")[-CONSOLE_MAX_LINES - 1:])
+    console.configure(state="normal")
+    console.insert(tk.END, text)
+    lines = int(console.index("end-1c").split(".")[0])
+    if lines > CONSOLE_MAX_LINES:
+        console.delete("1.0", f"{lines - CONSOLE_MAX_LINES + 1}.0")
+    console.see(tk.END)
+    console.configure(state="disabled")
+
+
+def drain_queue(output, limit=CONSOLE_BATCH_CHARS):
+    """Забирает накопившиеся куски вывода пачкой, но не больше limit символов за раз"""
+    items = []
+    size = 0
+    while size < limit:
+        try:
+            item = output.get_nowait()
+        except queue.Empty:
+            break
+        items.append(item)
+        size += len(item[-1]) if isinstance(item, tuple) else len(item)
+    return items
 
 
-# ----------------------------
-# Утилиты
-# ----------------------------
-def load_json(path):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return []
-    return []
+class LineBuffer:
+    """Последние CONSOLE_MAX_LINES строк вывода; незавершённая строка дописывается следующим куском"""
 
+    def __init__(self, max_lines=CONSOLE_MAX_LINES):
+        self.lines = deque(maxlen=max_lines)
 
-def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    def append(self, text):
+        if self.lines and not self.lines[-1].endswith("\n"):
+            text = self.lines.pop() + text
+        self.lines.extend(text.splitlines(keepends=True))
 
-
-# ----------------------------
-# Менеджер скриптов (логика)
-# ----------------------------
-class ScriptManager:
-    def __init__(self, db_file=DB_FILE):
-        self.db_file = db_file
-        self.scripts = load_json(self.db_file)
-
-    def save(self):
-        save_json(self.db_file, self.scripts)
-
-    def add_script(self, script_data):
-        # script_data должен содержать: name, description, path, language, mode, params (list)
-        # гарантируем уникальный id
-        if "id" not in script_data:
-            script_data["id"] = str(uuid.uuid4())
-        self.scripts.append(script_data)
-        self.save()
-
-    def update_script(self, script_id, new_data):
-        for i, s in enumerate(self.scripts):
-            if s.get("id") == script_id:
-                new_data["id"] = script_id
-                self.scripts[i] = new_data
-                self.save()
-                return True
-        return False
-
-    def remove_script(self, script_id):
-        self.scripts = [s for s in self.scripts if s.get("id") != script_id]
-        self.save()
-
-    def search(self, query="", search_name=True, search_desc=False, search_code=False):
-        q = (query or "").lower().strip()
-        if not q:
-            return list(self.scripts)
-        results = []
-        for s in self.scripts:
-            found = False
-            if search_name and q in s.get("name", "").lower():
-                found = True
-            if search_desc and q in s.get("description", "").lower():
-                found = True
-            if search_code:
-                try:
-                    with open(s.get("path", ""), "r", encoding="utf-8") as f:
-                        if q in f.read().lower():
-                            found = True
-                except Exception:
-                    pass
-            if found:
-                results.append(s)
-        return results
+    def text(self):
+        return "".join(self.lines)
 
 
 # ----------------------------
@@ -337,10 +322,12 @@ class ParamDialog(tk.Toplevel):
 # Диалог запуска: ввод параметров + встроенная консоль (stdout/stderr)
 # ----------------------------
 class RunDialog(tk.Toplevel):
-    def __init__(self, parent, script):
+    def __init__(self, parent, script, scheduler: JobScheduler):
         super().__init__(parent)
         self.parent = parent
         self.script = script
+        self.scheduler = scheduler
+        self.jobs = []  # задачи, запущенные из этого окна
         self.title(f"Запуск: {script.get('name')}")
         self.geometry("800x500")
         self.transient(parent)
@@ -349,7 +336,14 @@ class RunDialog(tk.Toplevel):
         self.focus()
 
         self.entries = {}  # name -> (widget, type)
+        self._output = queue.Queue()  # куски вывода от фоновых потоков; в Text пишет только Tk-поток
+        self._closed = False
+        self._log_file = None
+        self._log_lock = threading.Lock()  # лог пишут потоки задач; он живёт, пока идут задачи окна
+        self._unfinished = set()  # id задач окна, которые ещё не завершились
+        self._drain_job = None
         self._build_ui()
+        self._drain_job = self.after(CONSOLE_POLL_MS, self._drain_output)
 
     def _build_ui(self):
         pad = {"padx": 6, "pady": 4}
@@ -397,6 +391,13 @@ class RunDialog(tk.Toplevel):
         btn_fr.pack(fill=tk.X, padx=6, pady=4)
         ttk.Button(btn_fr, text="Запустить", command=self._on_run).pack(side=tk.RIGHT, padx=4)
         ttk.Button(btn_fr, text="Закрыть", command=self._on_close).pack(side=tk.RIGHT)
+        ttk.Button(btn_fr, text="Остановить", command=self._on_stop).pack(side=tk.RIGHT, padx=4)
+        self.priority_var = tk.StringVar(value="Обычный")
+        ttk.Combobox(btn_fr, textvariable=self.priority_var, values=list(PRIORITIES), state="readonly",
+                     width=10).pack(side=tk.RIGHT, padx=4)
+        ttk.Label(btn_fr, text="Приоритет:").pack(side=tk.RIGHT)
+        self.spill_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_fr, text="Полный вывод в лог-файл", variable=self.spill_var).pack(side=tk.LEFT)
 
         # Консоль (Text)
         lbl = ttk.Label(self, text="Консоль (stdout/stderr):")
@@ -408,173 +409,470 @@ class RunDialog(tk.Toplevel):
         sb = ttk.Scrollbar(self, orient="vertical", command=self.console.yview)
         self.console.configure(yscrollcommand=sb.set)
         sb.place(in_=self.console, relx=1.0, rely=0, relheight=1.0, anchor="ne")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _append_console(self, text):
-        self.console.configure(state="normal")
-        self.console.insert(tk.END, text)
-        self.console.see(tk.END)
-        self.console.configure(state="disabled")
+        """Потокобезопасно: текст сразу пишется в лог, в консоль — при следующей выгрузке очереди"""
+        with self._log_lock:
+            if self._log_file:
+                self._log_file.write(text)
+        if not self._closed:
+            self._output.put(text)
+
+    def _on_job_finish(self, job):
+        # вызывается из фонового потока; после закрытия окна лог закрывает последняя завершившаяся задача
+        with self._log_lock:
+            self._unfinished.discard(job.id)
+            if self._closed and not self._unfinished:
+                self._close_log()
+
+    def _close_log(self):
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+    def _drain_output(self):
+        chunks = drain_queue(self._output)
+        if chunks:
+            self._write_console("".join(chunks))
+        self._drain_job = self.after(CONSOLE_POLL_MS, self._drain_output)
+
+    def _write_console(self, text):
+        write_console(self.console, text)
+
+    def _open_log(self):
+        """Если включено — открывает лог-файл для полного вывода (один на окно запуска)"""
+        if not self.spill_var.get() or self._log_file:
+            return
+        os.makedirs(LOG_DIR, exist_ok=True)
+        name = "".join(c if c.isalnum() else "_" for c in self.script.get("name", "script"))
+        log_path = os.path.join(LOG_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.log")
+        try:
+            log_file = open(log_path, "w", encoding="utf-8")
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось открыть лог-файл: {e}")
+            return
+        with self._log_lock:
+            self._log_file = log_file
+        self._write_console(f"Полный вывод пишется в {log_path}\n")
 
     def _on_run(self):
         # собираем аргументы в зависимости от типа и режима
-        args_raw = {}
-        for name, (widget, ptype) in self.entries.items():
-            v = widget.get().strip()
-            args_raw[name] = (v, ptype)
-
-        # преобразуем в аргументы для script (cli) или для function (будем передавать JSON)
-        mode = self.script.get("mode", "script")
-        language = self.script.get("language", "python")
-        path = self.script.get("path")
-
-        # Формируем команду
-        if mode == "script":
-            # пример: python path/to/test.py --param1 value1 --list paramA,paramB
-            cmd = []
-            if language == "python":
-                cmd.append(sys.executable)
-                cmd.append(path)
-            elif language == "bash":
-                cmd.append("bash")
-                cmd.append(path)
-            elif language == "powershell":
-                cmd = ["powershell", "-File", path]
-            else:
-                messagebox.showerror("Ошибка", f"Неизвестный язык: {language}")
-                return
-
-            # добавляем параметры как --name value
-            for name, (val, ptype) in args_raw.items():
-                if val == "":
-                    continue
-                cli_name = f"--{name}"
-                if ptype == "число":
-                    try:
-                        _ = float(val)  # проверка
-                        cmd.append(cli_name)
-                        cmd.append(str(val))
-                    except Exception:
-                        messagebox.showerror("Ошибка", f"Параметр {name} должен быть числом")
-                        return
-                elif ptype == "список чисел":
-                    parts = [p.strip() for p in val.split(",") if p.strip() != ""]
-                    try:
-                        parts = [str(float(p)) for p in parts]
-                    except Exception:
-                        messagebox.showerror("Ошибка", f"Параметр {name} должен быть списком чисел через запятую")
-                        return
-                    cmd.append(cli_name)
-                    # передадим как запятую-список
-                    cmd.append(",".join(parts))
-                elif ptype == "список строк":
-                    parts = [p.strip() for p in val.split(",") if p.strip() != ""]
-                    cmd.append(cli_name)
-                    cmd.append(",".join(parts))
-                else:  # строка, путь до директории или файловый путь
-                    cmd.append(cli_name)
-                    cmd.append(val)
-            # Запускаем подпроцесс и ведём вывод
-            self._run_subprocess(cmd)
-
-        elif mode == "function":
-            # Будем запустить подпроцесс python, который импортирует модуль и вызовет main(args...)
-            # Для передачи аргументов используем JSON, чтобы корректно пробросить списки/числа/строки.
-            import json as _json
-            parsed_args = []
-            for name, (val, ptype) in args_raw.items():
-                if ptype == "число":
-                    if val == "":
-                        parsed_args.append(None)
-                    else:
-                        try:
-                            if "." in val:
-                                parsed_args.append(float(val))
-                            else:
-                                parsed_args.append(int(val))
-                        except Exception:
-                            messagebox.showerror("Ошибка", f"Параметр {name} должен быть числом")
-                            return
-                elif ptype == "список чисел":
-                    if val == "":
-                        parsed_args.append([])
-                    else:
-                        parts = [p.strip() for p in val.split(",") if p.strip() != ""]
-                        try:
-                            nums = [float(p) if "." in p else int(p) for p in parts]
-                        except Exception:
-                            messagebox.showerror("Ошибка", f"{name}: список чисел должен быть через запятую")
-                            return
-                        parsed_args.append(nums)
-                elif ptype == "список строк":
-                    if val == "":
-                        parsed_args.append([])
-                    else:
-                        parsed_args.append([p.strip() for p in val.split(",") if p.strip() != ""])
-                else:
-                    parsed_args.append(val)
-
-            # Упакуем parsed_args в JSON и передадим как единый аргумент
-            json_args = json.dumps(parsed_args, ensure_ascii=False)
-            # Команда будет: python -c "import importlib.util,sys,json; ... " "<json_args>"
-            # Соберём команду аккуратно
-            if language != "python":
-                messagebox.showerror("Ошибка", "Режим function поддерживается только для python-скриптов")
-                return
-
-            # конструируем однострочник python, который импортирует модуль по пути и вызовет main(*args)
-            # использование repr(json_args) чтобы корректно передать через argv
-            wrapper_code = (
-                "import importlib.util,sys,json\n"
-                "args_json=sys.argv[1]\n"
-                "args=json.loads(args_json)\n"
-                "spec=importlib.util.spec_from_file_location('user_module', r'''%s''')\n"
-                "m=importlib.util.module_from_spec(spec)\n"
-                "spec.loader.exec_module(m)\n"
-                "if hasattr(m,'main'):\n"
-                "    try:\n"
-                "        res=m.main(*args)\n"
-                "        if res is not None:\n"
-                "            print(res)\n"
-                "    except Exception as e:\n"
-                "        import traceback\n"
-                "        traceback.print_exc()\n"
-                "else:\n"
-                "    print('Module has no main(*args)')\n"
-            ) % path
-
-            cmd = [sys.executable, "-c", wrapper_code, json_args]
-            self._run_subprocess(cmd)
+        values = {name: widget.get().strip() for name, (widget, _) in self.entries.items()}
 
-        else:
-            messagebox.showerror("Ошибка", f"Неизвестный режим: {mode}")
+        self._open_log()
 
-    def _run_subprocess(self, cmd):
-        # Запускаем процесс и читаем stdout/stderr в поток
-        self._append_console(f"Запускаю: {' '.join(shlex.quote(c) for c in cmd)}\n\n")
+        # script — команда с --name value, function — main(*args) в "тёплом" воркере из пула
         try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
-        except Exception as e:
-            messagebox.showerror("Ошибка запуска", str(e))
+            job = make_job(self.script, values)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
             return
-
-        def reader_thread():
-            try:
-                for line in proc.stdout:
-                    self._append_console(line)
-            except Exception as e:
-                self._append_console(f"\n[Ошибка чтения вывода процесса: {e}]\n")
-            finally:
-                proc.wait()
-                self._append_console(f"\n[Процесс завершился с кодом {proc.returncode}]\n")
-
-        t = threading.Thread(target=reader_thread, daemon=True)
-        t.start()
+        # процесс запустит очередь задач, когда освободится слот
+        self._submit(job)
+
+    def _submit(self, job):
+        job.priority = PRIORITIES.get(self.priority_var.get(), 0)
+        job.on_output = self._append_console
+        job.on_finish = self._on_job_finish
+        with self._log_lock:
+            self._unfinished.add(job.id)
+        self.jobs.append(job)
+        self.scheduler.submit(job)
+
+    def _on_stop(self):
+        for job in self.jobs:
+            self.scheduler.cancel(job.id)
 
     def _on_close(self):
         # try:
         #     self.grab_release()
         # except Exception:
         #     pass
+        if self._drain_job:
+            self.after_cancel(self._drain_job)
+        with self._log_lock:
+            # консоль больше не нужна, но лог дописывается, пока не завершатся задачи окна
+            self._closed = True
+            if not self._unfinished:
+                self._close_log()
+        self.destroy()
+
+
+# ----------------------------
+# Пакетный запуск (один скрипт по таблице наборов параметров)
+# ----------------------------
+class BatchDialog(tk.Toplevel):
+    REFRESH_MS = 500
+
+    def __init__(self, parent, script, scheduler: JobScheduler):
+        super().__init__(parent)
+        self.script = script
+        self.scheduler = scheduler
+        self.title(f"Пакетный запуск: {script.get('name')}")
+        self.geometry("1000x600")
+        self.transient(parent)
+        self.names = [p["name"] for p in script.get("params", [])]
+        self.rows = []      # наборы параметров
+        self.jobs = {}      # номер строки -> Job
+        self.outputs = {}   # номер строки -> LineBuffer с хвостом вывода
+        self._output = queue.Queue()  # (LineBuffer, кусок) от фоновых потоков; разбирает только Tk-поток
+        self._closed = False
+        self._refresh_job = None
+        self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._drain_job = self.after(CONSOLE_POLL_MS, self._drain_output)
+
+    def _build_ui(self):
+        top_fr = ttk.Frame(self)
+        top_fr.pack(fill=tk.X, padx=6, pady=6)
+        ttk.Label(top_fr, text="Таблица параметров (CSV/JSON):").pack(side=tk.LEFT)
+        self.file_var = tk.StringVar()
+        ttk.Entry(top_fr, textvariable=self.file_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=4)
+        ttk.Button(top_fr, text="...", width=3, command=self._choose_file).pack(side=tk.LEFT)
+        ttk.Button(top_fr, text="Загрузить", command=self._load).pack(side=tk.LEFT, padx=4)
+
+        columns = ("num", *self.names, "state", "code")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse", height=12)
+        self.tree.heading("num", text="#")
+        self.tree.column("num", width=40, anchor="center")
+        for name in self.names:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=180, anchor="w")
+        self.tree.heading("state", text="Состояние")
+        self.tree.column("state", width=100, anchor="center")
+        self.tree.heading("code", text="Код")
+        self.tree.column("code", width=50, anchor="center")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=6, pady=4)
+        self.tree.bind("<<TreeviewSelect>>", lambda e: self._show_output())
+
+        btn_fr = ttk.Frame(self)
+        btn_fr.pack(fill=tk.X, padx=6, pady=4)
+        ttk.Button(btn_fr, text="Запустить все", command=self._run_all).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Повторить неуспешные", command=self._rerun_failed).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Остановить", command=self._stop).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Сохранить отчёт", command=self._save_report).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Закрыть", command=self._on_close).pack(side=tk.RIGHT)
+        self.summary_var = tk.StringVar()
+        ttk.Label(btn_fr, textvariable=self.summary_var).pack(side=tk.RIGHT, padx=8)
+
+        ttk.Label(self, text="Вывод выбранной строки:").pack(anchor="w", padx=6)
+        self.console = tk.Text(self, height=12, wrap="none", state="disabled")
+        self.console.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+
+    def _choose_file(self):
+        fp = filedialog.askopenfilename(filetypes=[("CSV/JSON", "*.csv *.json"), ("Все файлы", "*.*")])
+        if fp:
+            self.file_var.set(fp)
+            self._load()
+
+    def _load(self):
+        if any(job.state not in JOB_FINISHED for job in self.jobs.values()):
+            messagebox.showinfo("Пакетный запуск", "Дождитесь окончания или остановите текущий пакет")
+            return
+        try:
+            rows = load_param_table(self.file_var.get().strip(), self.script)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать таблицу:\n{e}")
+            return
+        self.rows = rows
+        self.jobs.clear()
+        self.outputs.clear()
+        self.tree.delete(*self.tree.get_children())
+        for num, row in enumerate(rows):
+            self.tree.insert("", tk.END, iid=str(num),
+                             values=(num + 1, *(row[name] for name in self.names), "", ""))
+        self._show_output()
+        self._refresh()
+
+    def _submit(self, num):
+        output = self.outputs[num] = LineBuffer()
+        if self._selected_row() == num:
+            self._show_output()
+        try:
+            job = make_job(self.script, self.rows[num], on_output=lambda text: self._queue_output(output, text))
+        except ValueError as e:
+            # строка с некорректными параметрами не запускается
+            self._output.put((output, f"[{e}]\n"))
+            self.jobs.pop(num, None)
+            self.tree.set(str(num), "state", JOB_FAILED)
+            return
+        self.jobs[num] = job
+        self.scheduler.submit(job)
+
+    def _run_all(self):
+        if not self.rows:
+            messagebox.showinfo("Пакетный запуск", "Загрузите таблицу параметров")
+            return
+        for num in range(len(self.rows)):
+            job = self.jobs.get(num)
+            if job is None or job.state in JOB_FINISHED:
+                self._submit(num)
+        self._refresh()
+
+    def _rerun_failed(self):
+        for num in range(len(self.rows)):
+            job = self.jobs.get(num)
+            if (job is None and num in self.outputs) or (job and job.state in (JOB_FAILED, JOB_KILLED, JOB_CANCELLED)):
+                self._submit(num)
+        self._refresh()
+
+    def _stop(self):
+        for job in self.jobs.values():
+            self.scheduler.cancel(job.id)
+
+    def _refresh(self):
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        counts = {}
+        for num, job in self.jobs.items():
+            self.tree.set(str(num), "state", job.state)
+            self.tree.set(str(num), "code", "" if job.exit_code is None else job.exit_code)
+            counts[job.state] = counts.get(job.state, 0) + 1
+        self.summary_var.set(", ".join(f"{state}: {n}" for state, n in counts.items()))
+        if any(job.state not in JOB_FINISHED for job in self.jobs.values()):
+            self._refresh_job = self.after(self.REFRESH_MS, self._refresh)
+
+    def _queue_output(self, output, text):
+        """Потокобезопасно; после закрытия окна очередь никто не разбирает — вывод больше не копится"""
+        if not self._closed:
+            self._output.put((output, text))
+
+    def _selected_row(self):
+        sel = self.tree.selection()
+        return int(sel[0]) if sel else None
+
+    def _drain_output(self):
+        # вывод раскладывается по строкам пакета; в консоль дописываются только новые куски выбранной строки
+        shown = self.outputs.get(self._selected_row())
+        new_text = []
+        for output, chunk in drain_queue(self._output):
+            output.append(chunk)
+            if output is shown:
+                new_text.append(chunk)
+        if new_text:
+            write_console(self.console, "".join(new_text))
+        self._drain_job = self.after(CONSOLE_POLL_MS, self._drain_output)
+
+    def _show_output(self):
+        """Консоль целиком перерисовывается только при смене выбранной строки"""
+        output = self.outputs.get(self._selected_row())
+        self.console.configure(state="normal")
+        self.console.delete("1.0", tk.END)
+        self.console.configure(state="disabled")
+        if output is not None:
+            write_console(self.console, output.text())
+
+    def _save_report(self):
+        if not self.rows:
+            return
+        fp = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not fp:
+            return
+        report = []
+        for num, row in enumerate(self.rows):
+            job = self.jobs.get(num)
+            report.append({
+                "row": num + 1,
+                "params": row,
+                "state": job.state if job else (JOB_FAILED if num in self.outputs else None),
+                "exit_code": job.exit_code if job else None,
+                "duration": round(job.duration, 3) if job and job.started else None,
+                "output": self.outputs[num].text() if num in self.outputs else "",
+            })
+        save_json(fp, report)
+
+    def _on_close(self):
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
+        self.after_cancel(self._drain_job)
+        self._closed = True
+        self._output = queue.Queue()  # то, что уже накопилось, тоже не нужно
+        self.destroy()
+
+
+# ----------------------------
+# Окно истории запусков
+# ----------------------------
+def format_seconds(value):
+    if value is None:
+        return ""
+    if value < 60:
+        return f"{value:.2f} с"
+    minutes, seconds = divmod(int(value), 60)
+    return f"{minutes}:{seconds:02d} мин"
+
+
+def format_bytes(value):
+    if value is None:
+        return ""
+    for unit in ("Б", "КБ", "МБ"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} ГБ"
+
+
+class HistoryDialog(tk.Toplevel):
+    def __init__(self, parent, history: RunHistory, script_id=None):
+        super().__init__(parent)
+        self.history = history
+        self.title("История запусков")
+        self.geometry("1000x600")
+        self.transient(parent)
+        self._build_ui()
+        self.refresh()
+        if script_id and self.summary.exists(self._iid(script_id)):
+            self.summary.selection_set(self._iid(script_id))
+            self.summary.see(self._iid(script_id))
+
+    @staticmethod
+    def _iid(script_id):
+        # "" — корень Treeview, поэтому id скрипта не годится как iid напрямую
+        return f"s:{script_id or ''}"
+
+    def _build_ui(self):
+        ttk.Label(self, text="По скриптам (длительность):").pack(anchor="w", padx=6, pady=(6, 0))
+        columns = ("name", "count", "p50", "p95", "recent", "errors", "last")
+        self.summary = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse", height=8)
+        for col, text, width in (("name", "Скрипт", 300), ("count", "Запусков", 80), ("p50", "p50", 90),
+                                 ("p95", "p95", 90), ("recent", "p50 (10 посл.)", 110),
+                                 ("errors", "Ошибок", 70), ("last", "Последний", 150)):
+            self.summary.heading(col, text=text)
+            self.summary.column(col, width=width, anchor="w" if col == "name" else "center")
+        self.summary.pack(fill=tk.X, padx=6, pady=4)
+        self.summary.bind("<<TreeviewSelect>>", lambda e: self._show_runs())
+
+        ttk.Label(self, text="Запуски:").pack(anchor="w", padx=6)
+        columns = ("started", "wall", "cpu", "rss", "code", "output", "args")
+        self.runs = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for col, text, width in (("started", "Начало", 150), ("wall", "Длительность", 100), ("cpu", "CPU", 90),
+                                 ("rss", "Пик памяти", 90), ("code", "Код", 50), ("output", "Вывод", 80),
+                                 ("args", "Аргументы", 400)):
+            self.runs.heading(col, text=text)
+            self.runs.column(col, width=width, anchor="w" if col == "args" else "center")
+        self.runs.pack(fill=tk.BOTH, expand=True, padx=6, pady=4)
+
+        btn_fr = ttk.Frame(self)
+        btn_fr.pack(fill=tk.X, padx=6, pady=6)
+        ttk.Button(btn_fr, text="Закрыть", command=self.destroy).pack(side=tk.RIGHT)
+        ttk.Button(btn_fr, text="Обновить", command=self.refresh).pack(side=tk.RIGHT, padx=4)
+
+    def refresh(self):
+        selected = self.summary.selection()
+        self.summary.delete(*self.summary.get_children())
+        for g in self.history.aggregates():
+            last = time.strftime("%Y-%m-%d %H:%M", time.localtime(g["last"])) if g["last"] else ""
+            self.summary.insert("", tk.END, iid=self._iid(g["script_id"]), values=(
+                g["name"], g["count"], format_seconds(g["p50"]), format_seconds(g["p95"]),
+                format_seconds(g["recent_p50"]), g["errors"], last))
+        selected = [iid for iid in selected if self.summary.exists(iid)]
+        if selected:
+            self.summary.selection_set(selected)
+        self._show_runs()
+
+    def _show_runs(self):
+        self.runs.delete(*self.runs.get_children())
+        sel = self.summary.selection()
+        for run in self.history.runs(sel[0][len("s:"):] if sel else None):
+            self.runs.insert("", tk.END, values=(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"])),
+                format_seconds(run["wall_time"]), format_seconds(run["cpu_time"]), format_bytes(run["peak_rss"]),
+                "" if run["exit_code"] is None else run["exit_code"], format_bytes(run["output_size"]),
+                run["args"]))
+
+
+# ----------------------------
+# Панель задач
+# ----------------------------
+class JobsDialog(tk.Toplevel):
+    REFRESH_MS = 500
+
+    def __init__(self, parent, scheduler: JobScheduler):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.title("Задачи")
+        self.geometry("900x450")
+        self.transient(parent)
+        self._refresh_job = None
+        self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.refresh()
+
+    def _build_ui(self):
+        # лимиты одновременных задач
+        lim_fr = ttk.Frame(self)
+        lim_fr.pack(fill=tk.X, padx=6, pady=6)
+        ttk.Label(lim_fr, text="Одновременно всего:").pack(side=tk.LEFT)
+        self.total_var = tk.IntVar(value=self.scheduler.max_total)
+        self._limit_spinbox(lim_fr, 1, self.total_var)
+        self.lang_vars = {}
+        for language in LANGUAGES:
+            ttk.Label(lim_fr, text=f"{language}:").pack(side=tk.LEFT)
+            var = tk.IntVar(value=self.scheduler.max_per_language.get(language, 0))
+            self._limit_spinbox(lim_fr, 0, var)
+            self.lang_vars[language] = var
+        ttk.Label(lim_fr, text="(0 — без лимита)").pack(side=tk.LEFT)
+
+        columns = ("id", "name", "lang", "priority", "state", "time", "code", "pid")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="extended")
+        for col, text, width in (("id", "#", 50), ("name", "Скрипт", 300), ("lang", "Язык", 90),
+                                 ("priority", "Приоритет", 80), ("state", "Состояние", 110),
+                                 ("time", "Время", 90), ("code", "Код", 50), ("pid", "PID", 70)):
+            self.tree.heading(col, text=text)
+            self.tree.column(col, width=width, anchor="w" if col == "name" else "center")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=6, pady=4)
+
+        btn_fr = ttk.Frame(self)
+        btn_fr.pack(fill=tk.X, padx=6, pady=6)
+        ttk.Button(btn_fr, text="Отменить / остановить", command=self._cancel_selected).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Убрать завершённые", command=self._clear_finished).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Закрыть", command=self._on_close).pack(side=tk.RIGHT)
+
+    def _limit_spinbox(self, parent, from_, var):
+        # лимиты применяются, только когда пользователь их меняет: стрелками, Enter или уходом из поля
+        spinbox = ttk.Spinbox(parent, from_=from_, to=64, width=4, textvariable=var, command=self._apply_limits)
+        spinbox.bind("<Return>", lambda e: self._apply_limits())
+        spinbox.bind("<FocusOut>", lambda e: self._apply_limits())
+        spinbox.pack(side=tk.LEFT, padx=(4, 12))
+
+    def _apply_limits(self):
+        try:
+            total = self.total_var.get()
+            per_language = {language: var.get() for language, var in self.lang_vars.items()}
+        except tk.TclError:
+            return  # в поле не число — ждём исправления
+        self.scheduler.set_limits(max_total=max(1, total), **per_language)
+
+    def refresh(self):
+        priority_names = {v: k for k, v in PRIORITIES.items()}
+        jobs = self.scheduler.jobs()
+        ids = {str(job.id) for job in jobs}
+        for iid in self.tree.get_children():
+            if iid not in ids:
+                self.tree.delete(iid)
+        for job in jobs:
+            values = (job.id, job.script.get("name"), job.language, priority_names.get(job.priority, job.priority),
+                      job.state, format_seconds(job.duration), "" if job.exit_code is None else job.exit_code,
+                      job.pid or "")
+            iid = str(job.id)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert("", tk.END, iid=iid, values=values)
+        self._refresh_job = self.after(self.REFRESH_MS, self.refresh)
+
+    def _cancel_selected(self):
+        for iid in self.tree.selection():
+            self.scheduler.cancel(int(iid))
+
+    def _clear_finished(self):
+        self.scheduler.clear_finished()
+
+    def _on_close(self):
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
         self.destroy()
 
 
@@ -588,6 +886,10 @@ class ScriptApp:
         self.root.geometry("1100x700")
 
         self.manager = ScriptManager()
+        self.worker_pool = WorkerPool()
+        self.history = RunHistory()
+        self.scheduler = JobScheduler(self.worker_pool, self.history)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_exit)
 
         # переменные поиска
         self.search_var = tk.StringVar()
@@ -692,6 +994,9 @@ class ScriptApp:
         ttk.Button(btn_fr, text="Удалить", command=self._delete_selected).pack(side=tk.LEFT, padx=4)
         ttk.Button(btn_fr, text="Открыть в редакторе", command=self._open_editor).pack(side=tk.LEFT, padx=4)
         ttk.Button(btn_fr, text="Запустить", command=self._open_run).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Пакетный запуск", command=self._open_batch).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="История", command=self._open_history).pack(side=tk.LEFT, padx=4)
+        ttk.Button(btn_fr, text="Задачи", command=self._open_jobs).pack(side=tk.LEFT, padx=4)
         ttk.Button(btn_fr, text="Обновить", command=self.refresh_list).pack(side=tk.RIGHT, padx=4)
 
     def refresh_list(self):
@@ -762,7 +1067,7 @@ class ScriptApp:
         # preview
         self.preview.delete("1.0", tk.END)
         try:
-            with open(s.get("path", ""), "r", encoding="utf-8") as f:
+            with open(script_path(s), "r", encoding="utf-8") as f:
                 self.preview.insert("1.0", f.read())
         except Exception as e:
             self.preview.insert("1.0", f"[Ошибка чтения файла: {e}]")
@@ -796,11 +1101,10 @@ class ScriptApp:
         if not s:
             messagebox.showinfo("Открыть", "Выберите скрипт")
             return
-        path = s.get("path")
+        path = script_path(s)
         try:
             if sys.platform.startswith("win"):
-                current_dir = Path(__file__).resolve().parent
-                os.startfile(current_dir / path)
+                os.startfile(path)
             elif sys.platform == "darwin":
                 subprocess.run(["open", path])
             else:
@@ -813,7 +1117,30 @@ class ScriptApp:
         if not s:
             messagebox.showinfo("Запуск", "Выберите скрипт")
             return
-        RunDialog(self.root, s)
+        RunDialog(self.root, s, self.scheduler)
+
+    def _open_batch(self):
+        s = self._get_selected_script()
+        if not s:
+            messagebox.showinfo("Пакетный запуск", "Выберите скрипт")
+            return
+        BatchDialog(self.root, s, self.scheduler)
+
+    def _open_history(self):
+        s = self._get_selected_script()
+        HistoryDialog(self.root, self.history, s.get("id") if s else None)
+
+    def _open_jobs(self):
+        JobsDialog(self.root, self.scheduler)
+
+    def _on_exit(self):
+        running = self.scheduler.running_count()
+        if running and not messagebox.askyesno("Выход", f"Выполняется задач: {running}. Всё равно выйти?"):
+            return
+        self.scheduler.shutdown()
+        self.worker_pool.shutdown()
+        self.history.close()
+        self.root.destroy()
 
 
 # ----------------------------
@@ -0,0 +1,943 @@
+"""
+Ядро запуска скриптов (без GUI) — общее для main.py (tkinter), cli.py и HTTP API
+- реестр скриптов (scripts.json) и поиск по триграммному индексу
+- пул "тёплых" воркеров для режима function
+- сборка команды/аргументов из значений параметров
+- очередь задач с лимитами и приоритетами, история запусков
+"""
+
+from pathlib import Path
+import subprocess
+import os
+import sys
+import json
+import threading
+import uuid
+import shlex
+import time
+import io
+import codecs
+import locale
+import math
+import sqlite3
+import itertools
+import csv
+
+try:
+    import psutil  # необязательно: пиковая память и CPU для процессов скриптов
+except ImportError:
+    psutil = None
+
+DB_FILE = "scripts.json"
+WORKER_FILE = str(Path(__file__).resolve().parent / "worker.py")
+WORKER_DONE_MARKER = "\x00__WORKER_DONE__"  # должен совпадать с worker.DONE_MARKER
+HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".scriptsManager", "history.sqlite")
+
+DEFAULT_MAX_JOBS = min(4, os.cpu_count() or 1)  # одновременно выполняемых задач (всего)
+KEEP_FINISHED_JOBS = 500  # завершённых задач в памяти планировщика
+LANGUAGES = ("python", "bash", "powershell")
+
+
+# ----------------------------
+# Утилиты
+# ----------------------------
+def load_json(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except Exception:
+                return []
+    return []
+
+
+def save_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+# ----------------------------
+# Индекс для поиска (триграммы по коду, названию и описанию)
+# ----------------------------
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ScriptIndex:
+    """
+    Инвертированный триграммный индекс по скриптам.
+    Триграммы кода хранятся в файле рядом с scripts.json и обновляются только
+    для файлов, у которых изменились mtime/size. Кандидаты из индекса
+    проверяются точным поиском подстроки, поэтому результаты совпадают с полным перебором.
+    """
+    FIELDS = ("name", "description", "code")
+    REFRESH_INTERVAL = 2.0  # сек. — как часто перепроверять mtime файлов при поиске
+
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self.files = {}    # id -> {"path", "mtime", "size", "trigrams"} (сохраняется на диск)
+        self.texts = {}    # (field, id) -> текст в нижнем регистре (только в памяти)
+        self.postings = {f: {} for f in self.FIELDS}  # field -> trigram -> set(id)
+        self._doc_trigrams = {}  # (field, id) -> set(trigram)
+        self._last_refresh = 0.0
+        data = load_json(index_file)
+        if isinstance(data, dict):
+            self.files = data.get("files", {})
+        for sid, entry in self.files.items():
+            self._set_trigrams("code", sid, set(entry.get("trigrams", [])))
+
+    def save(self):
+        save_json(self.index_file, {"files": self.files})
+
+    def _set_trigrams(self, field, sid, grams):
+        postings = self.postings[field]
+        for g in self._doc_trigrams.pop((field, sid), ()):
+            ids = postings.get(g)
+            if ids is not None:
+                ids.discard(sid)
+                if not ids:
+                    del postings[g]
+        self._doc_trigrams[(field, sid)] = grams
+        for g in grams:
+            postings.setdefault(g, set()).add(sid)
+
+    def _index_text(self, field, sid, text):
+        text = (text or "").lower()
+        if self.texts.get((field, sid)) == text:
+            return
+        self.texts[(field, sid)] = text
+        self._set_trigrams(field, sid, trigrams(text))
+
+    def _read_code(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().lower()
+        except Exception:
+            return ""
+
+    def remove(self, sid):
+        for field in self.FIELDS:
+            self._set_trigrams(field, sid, set())
+            self._doc_trigrams.pop((field, sid), None)
+            self.texts.pop((field, sid), None)
+        if self.files.pop(sid, None) is not None:
+            self.save()
+
+    def sync(self, scripts, force=False):
+        """Подтягивает индекс к текущему списку скриптов (инкрементально по mtime/size)"""
+        now = time.monotonic()
+        check_files = force or now - self._last_refresh >= self.REFRESH_INTERVAL
+        changed = False
+        known = set()
+        for s in scripts:
+            sid = s.get("id") or s.get("name")
+            known.add(sid)
+            self._index_text("name", sid, s.get("name", ""))
+            self._index_text("description", sid, s.get("description", ""))
+            path = script_path(s)
+            entry = self.files.get(sid)
+            if not check_files and entry and entry["path"] == path:
+                continue
+            try:
+                st = os.stat(path)
+                mtime, size = st.st_mtime_ns, st.st_size
+            except OSError:
+                mtime, size = None, None
+            if entry and entry["path"] == path and entry["mtime"] == mtime and entry["size"] == size:
+                continue
+            code = self._read_code(path) if mtime is not None else ""
+            self.texts[("code", sid)] = code
+            grams = trigrams(code)
+            self._set_trigrams("code", sid, grams)
+            self.files[sid] = {"path": path, "mtime": mtime, "size": size, "trigrams": sorted(grams)}
+            changed = True
+        for sid in list(self.files):
+            if sid not in known:
+                self.remove(sid)
+        if check_files:
+            self._last_refresh = now
+        if changed:
+            self.save()
+
+    def _text(self, field, sid):
+        text = self.texts.get((field, sid))
+        if text is None and field == "code":
+            # после загрузки индекса с диска текст файла читается лениво, только для кандидатов
+            text = self._read_code(self.files.get(sid, {}).get("path", ""))
+            self.texts[(field, sid)] = text
+        return text or ""
+
+    def candidates(self, field, query):
+        """id, в тексте поля которых может встречаться query (None — индекс не сужает выбор)"""
+        grams = trigrams(query)
+        if not grams:
+            return None
+        postings = self.postings[field]
+        result = None
+        for g in sorted(grams, key=lambda g: len(postings.get(g, ()))):
+            ids = postings.get(g)
+            if not ids:
+                return set()
+            result = set(ids) if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def matches(self, field, query, sids):
+        found = self.candidates(field, query)
+        pool = sids if found is None else [sid for sid in sids if sid in found]
+        return {sid for sid in pool if query in self._text(field, sid)}
+
+
+# ----------------------------
+# Менеджер скриптов (логика)
+# ----------------------------
+def script_path(script):
+    """Путь к файлу скрипта; относительный путь считается от папки файла реестра, а не от текущей папки"""
+    path = script.get("path") or ""
+    base_dir = script.get("_base_dir")
+    if path and base_dir and not os.path.isabs(path):
+        return os.path.join(base_dir, path)
+    return path
+
+
+class ScriptManager:
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.base_dir = os.path.dirname(os.path.abspath(db_file))
+        self.scripts = load_json(self.db_file)
+        for s in self.scripts:
+            s["_base_dir"] = self.base_dir
+        self.index = ScriptIndex(os.path.splitext(self.db_file)[0] + "_index.json")
+        self._index_lock = threading.Lock()  # поиск может идти из нескольких потоков (API), индекс не потокобезопасен
+
+    def save(self):
+        # служебные поля (_base_dir) в файл не пишутся — пути в реестре остаются как введены
+        save_json(self.db_file, [{k: v for k, v in s.items() if not k.startswith("_")} for s in self.scripts])
+
+    def add_script(self, script_data):
+        # script_data должен содержать: name, description, path, language, mode, params (list)
+        # гарантируем уникальный id
+        if "id" not in script_data:
+            script_data["id"] = str(uuid.uuid4())
+        script_data["_base_dir"] = self.base_dir
+        self.scripts.append(script_data)
+        self.save()
+
+    def update_script(self, script_id, new_data):
+        for i, s in enumerate(self.scripts):
+            if s.get("id") == script_id:
+                new_data["id"] = script_id
+                new_data["_base_dir"] = self.base_dir
+                self.scripts[i] = new_data
+                self.save()
+                return True
+        return False
+
+    def get(self, ref):
+        """Скрипт по id, а если такого нет — по точному названию"""
+        for s in self.scripts:
+            if s.get("id") == ref:
+                return s
+        return next((s for s in self.scripts if s.get("name") == ref), None)
+
+    def remove_script(self, script_id):
+        self.scripts = [s for s in self.scripts if s.get("id") != script_id]
+        self.save()
+        with self._index_lock:
+            self.index.remove(script_id)
+
+    def search(self, query="", search_name=True, search_desc=False, search_code=False):
+        q = (query or "").lower().strip()
+        if not q:
+            return list(self.scripts)
+        sids = [s.get("id") or s.get("name") for s in self.scripts]
+        found = set()
+        with self._index_lock:
+            self.index.sync(self.scripts)
+            if search_name:
+                found |= self.index.matches("name", q, sids)
+            if search_desc:
+                found |= self.index.matches("description", q, sids)
+            if search_code:
+                found |= self.index.matches("code", q, sids)
+        return [s for s, sid in zip(self.scripts, sids) if sid in found]
+
+
+# ----------------------------
+# Пул "тёплых" воркеров для режима function
+# ----------------------------
+class Worker:
+    """Один долгоживущий процесс worker.py; модули скриптов остаются импортированными между запусками"""
+
+    def __init__(self):
+        env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+        self.proc = subprocess.Popen(
+            [sys.executable, WORKER_FILE],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            encoding="utf-8", errors="replace", bufsize=1, env=env,
+        )
+        self.paths = set()  # скрипты, модули которых уже загружены в этом воркере
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def run(self, path, args, on_output):
+        """Выполняет main(*args) скрипта path; вывод построчно отдаётся в on_output. Возвращает dict результата."""
+        job = json.dumps({"path": path, "args": args}, ensure_ascii=False)
+        self.proc.stdin.write(job + "\n")
+        self.proc.stdin.flush()
+        self.paths.add(path)
+        for line in self.proc.stdout:
+            pos = line.find(WORKER_DONE_MARKER)
+            if pos == -1:
+                on_output(line)
+                continue
+            if pos > 0:
+                on_output(line[:pos] + "\n")
+            return json.loads(line[pos + len(WORKER_DONE_MARKER):])
+        # stdout закрыт — воркер упал посреди задания
+        self.proc.wait()
+        return {"exit_code": self.proc.returncode, "crashed": True}
+
+    def close(self):
+        if not self.alive():
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+
+
+class WorkerPool:
+    def __init__(self, size=None):
+        self.size = size or min(4, os.cpu_count() or 1)
+        self._idle = []
+        self._busy = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self, path):
+        with self._cond:
+            while True:
+                self._idle = [w for w in self._idle if w.alive()]
+                if self._idle:
+                    # предпочитаем воркер, в котором модуль скрипта уже загружен
+                    worker = next((w for w in self._idle if path in w.paths), self._idle[-1])
+                    self._idle.remove(worker)
+                    self._busy += 1
+                    return worker
+                if self._busy < self.size:
+                    self._busy += 1
+                    break
+                self._cond.wait()
+        try:
+            return Worker()
+        except Exception:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker):
+        with self._cond:
+            self._busy -= 1
+            if worker.alive():
+                self._idle.append(worker)
+            self._cond.notify()
+
+    def run(self, path, args, on_output, on_start=None):
+        """Блокирующий вызов (запускать из фонового потока); on_start(worker) — перед отправкой задания"""
+        worker = self._acquire(path)
+        try:
+            if on_start:
+                on_start(worker)
+            return worker.run(path, args, on_output)
+        except Exception:
+            worker.proc.kill()
+            raise
+        finally:
+            self._release(worker)
+
+    def shutdown(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for w in idle:
+            w.close()
+
+
+# ----------------------------
+# История запусков
+# ----------------------------
+def percentile(values, p):
+    """Перцентиль методом ближайшего ранга"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class RssSampler:
+    """
+    Фоновый опрос процесса (и его детей) через psutil: пиковый RSS и CPU-время. Без psutil ничего не меряет.
+    relative=True — для тёплого воркера: peak_rss считается как прирост от RSS на старте задания,
+    чтобы в него не попадала память, набранная прошлыми запусками.
+    """
+
+    def __init__(self, pid, interval=0.25, relative=False):
+        self.pid = pid
+        self.interval = interval
+        self.relative = relative
+        self.peak_rss = None
+        self.cpu_time = None
+        self._base_cpu = None
+        self._base_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if psutil is None:
+            return self
+        try:
+            self._proc = psutil.Process(self.pid)
+            # воркер живёт между запусками — считаем CPU только за это задание
+            self._base_cpu = self._cpu()
+            if self.relative:
+                self._base_rss = self._rss()
+        except psutil.Error:
+            return self
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _cpu(self):
+        procs = [self._proc] + self._proc.children(recursive=True)
+        total = 0.0
+        for p in procs:
+            try:
+                t = p.cpu_times()
+                total += t.user + t.system
+            except psutil.Error:
+                pass
+        return total
+
+    def _rss(self):
+        rss = 0
+        for p in [self._proc] + self._proc.children(recursive=True):
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss or 0, self._rss() - self._base_rss)
+        self.cpu_time = self._cpu() - self._base_cpu
+
+    def _loop(self):
+        while True:
+            try:
+                self._sample()
+            except psutil.Error:
+                return
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join(timeout=1)
+        return self
+
+
+class RunHistory:
+    """История запусков в SQLite; запись идёт из фоновых потоков"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        script_id TEXT,
+        script_name TEXT,
+        mode TEXT,
+        args TEXT,
+        started REAL,
+        finished REAL,
+        wall_time REAL,
+        cpu_time REAL,
+        peak_rss INTEGER,
+        exit_code INTEGER,
+        output_size INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS runs_script ON runs(script_id, started);
+    """
+
+    def __init__(self, db_file=HISTORY_FILE):
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def record(self, script, mode, args, started, finished, wall_time, cpu_time=None, peak_rss=None,
+               exit_code=None, output_size=0):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (script_id, script_name, mode, args, started, finished, wall_time, cpu_time, "
+                "peak_rss, exit_code, output_size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (script.get("id"), script.get("name"), mode, json.dumps(args, ensure_ascii=False),
+                 started, finished, wall_time, cpu_time, peak_rss, exit_code, output_size))
+
+    def runs(self, script_id=None, limit=500):
+        """Последние запуски (новые первыми) как список dict"""
+        sql = "SELECT * FROM runs"
+        params = []
+        if script_id:
+            sql += " WHERE script_id = ?"
+            params.append(script_id)
+        sql += " ORDER BY started DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            cur = self.conn.execute(sql, params)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def aggregates(self, recent=10):
+        """По скриптам: число запусков, p50/p95 длительности, p50 последних recent запусков, ошибки"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT script_id, script_name, wall_time, exit_code, started FROM runs ORDER BY started").fetchall()
+        groups = {}
+        for sid, name, wall, code, started in rows:
+            g = groups.setdefault(sid, {"script_id": sid, "name": name, "times": [], "errors": 0, "last": None})
+            g["name"] = name  # последнее имя скрипта
+            g["times"].append(wall)
+            g["errors"] += 1 if code else 0
+            g["last"] = started
+        result = []
+        for g in groups.values():
+            times = g.pop("times")
+            g.update(count=len(times), p50=percentile(times, 50), p95=percentile(times, 95),
+                     recent_p50=percentile(times[-recent:], 50))
+            result.append(g)
+        result.sort(key=lambda g: g["last"] or 0, reverse=True)
+        return result
+
+    def close(self):
+        self.conn.close()
+
+
+# ----------------------------
+# Очередь задач
+# ----------------------------
+JOB_QUEUED = "в очереди"
+JOB_RUNNING = "выполняется"
+JOB_DONE = "завершена"
+JOB_FAILED = "ошибка"
+JOB_CANCELLED = "отменена"
+JOB_KILLED = "остановлена"
+JOB_FINISHED = (JOB_DONE, JOB_FAILED, JOB_CANCELLED, JOB_KILLED)
+
+
+def kill_process_tree(proc):
+    """Убивает процесс и (если есть psutil) всех его потомков"""
+    if psutil is not None:
+        try:
+            for child in psutil.Process(proc.pid).children(recursive=True):
+                child.kill()
+        except psutil.Error:
+            pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+class Job:
+    """Один запуск скрипта: mode="script" — команда cmd, mode="function" — main(*args) в воркере"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, script, mode, args, cmd=None, priority=0, on_output=None, on_finish=None):
+        self.id = next(Job._ids)
+        self.script = script
+        self.mode = mode
+        self.language = script.get("language", "python")
+        self.args = args
+        self.cmd = cmd
+        self.priority = priority
+        self.on_output = on_output
+        self.on_finish = on_finish  # on_finish(job) — из фонового потока, когда задача завершена/отменена
+        self.state = JOB_QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.exit_code = None
+        self.pid = None
+        self._kill = None  # как остановить запущенный процесс
+        self._cancelled = False
+
+    def emit(self, text):
+        if self.on_output:
+            self.on_output(text)
+
+    def _finish(self):
+        if self.on_finish:
+            self.on_finish(self)
+
+    @property
+    def duration(self):
+        """Сколько выполняется (или выполнялась); для задачи в очереди — сколько ждёт"""
+        if self.started is None:
+            return time.time() - self.created
+        return (self.finished or time.time()) - self.started
+
+
+class JobScheduler:
+    """
+    Центральная очередь запусков: приоритеты, ограничение числа одновременных задач
+    (всего и по языкам), отмена задач в очереди и остановка выполняющихся.
+    """
+
+    def __init__(self, worker_pool, history=None, max_total=DEFAULT_MAX_JOBS, max_per_language=None,
+                 keep_finished=KEEP_FINISHED_JOBS):
+        self.worker_pool = worker_pool
+        self.history = history
+        self.max_total = max_total
+        self.keep_finished = keep_finished  # сколько последних завершённых задач помнить (история — в RunHistory)
+        self.max_per_language = dict(max_per_language or {})  # язык -> лимит (нет ключа — без лимита)
+        self._queue = []
+        self._jobs = {}
+        self._running = {}  # язык -> число выполняющихся
+        self._running_functions = 0  # функции идут в воркерах пула: больше worker_pool.size не запускаем
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queue.append(job)
+        self._dispatch()
+        if job.state == JOB_QUEUED:
+            job.emit(f"[Задача #{job.id} в очереди: заняты все слоты]\n")
+        return job
+
+    def set_limits(self, max_total=None, **per_language):
+        """max_total — общий лимит; per_language: язык=лимит (0/None — без ограничения)"""
+        with self._lock:
+            if max_total:
+                self.max_total = max_total
+            for language, limit in per_language.items():
+                if limit:
+                    self.max_per_language[language] = limit
+                else:
+                    self.max_per_language.pop(language, None)
+        self._dispatch()
+
+    def cancel(self, job_id):
+        """Снимает задачу с очереди или останавливает выполняющуюся"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in JOB_FINISHED:
+                return
+            if job.state == JOB_QUEUED:
+                self._queue.remove(job)
+                job.state = JOB_CANCELLED
+                job.finished = time.time()
+                self._prune_finished()
+                kill = None
+            else:
+                job._cancelled = True
+                kill = job._kill
+        if job.state == JOB_CANCELLED:
+            job.emit(f"\n[Задача #{job.id} отменена]\n")
+            job._finish()
+        elif kill:
+            kill()
+
+    def jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.id)
+
+    def running_count(self):
+        with self._lock:
+            return sum(self._running.values())
+
+    def _prune_finished(self):
+        """Под self._lock: забывает самые старые завершённые задачи сверх keep_finished"""
+        finished = [j for j in self._jobs.values() if j.state in JOB_FINISHED]
+        for job in sorted(finished, key=lambda j: j.finished)[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job.id]
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = {jid: j for jid, j in self._jobs.items() if j.state not in JOB_FINISHED}
+
+    def shutdown(self):
+        """Снимает с очереди всё, что не успело запуститься"""
+        for job in self.jobs():
+            if job.state == JOB_QUEUED:
+                self.cancel(job.id)
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            # сначала высокий приоритет, при равном — кто раньше встал в очередь
+            for job in sorted(self._queue, key=lambda j: (-j.priority, j.id)):
+                if sum(self._running.values()) >= self.max_total:
+                    break
+                limit = self.max_per_language.get(job.language)
+                if limit and self._running.get(job.language, 0) >= limit:
+                    continue  # язык упёрся в лимит — задачи других языков могут идти
+                if job.mode == "function":
+                    if self._running_functions >= self.worker_pool.size:
+                        continue  # иначе задача числилась бы выполняющейся, ожидая свободный воркер
+                    self._running_functions += 1
+                self._queue.remove(job)
+                self._running[job.language] = self._running.get(job.language, 0) + 1
+                job.state = JOB_RUNNING
+                job.started = time.time()
+                started.append(job)
+        for job in started:
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        t0 = time.perf_counter()
+        try:
+            if job.mode == "script":
+                exit_code, cpu_time, peak_rss, output_size = self._run_script(job)
+            else:
+                exit_code, cpu_time, peak_rss, output_size = self._run_function(job)
+        except Exception as e:
+            job.emit(f"\n[Ошибка запуска: {e}]\n")
+            exit_code, cpu_time, peak_rss, output_size = None, None, None, 0
+        finished = time.time()
+        with self._lock:
+            self._running[job.language] -= 1
+            if job.mode == "function":
+                self._running_functions -= 1
+            job.exit_code = exit_code
+            job.finished = finished
+            job._kill = None
+            if job._cancelled:
+                job.state = JOB_KILLED
+            else:
+                job.state = JOB_DONE if exit_code == 0 else JOB_FAILED
+            self._prune_finished()
+        if job._cancelled:
+            job.emit(f"\n[Задача #{job.id} остановлена]\n")
+        if self.history is not None and exit_code is not None:
+            try:
+                self.history.record(job.script, job.mode, job.args, job.started, finished, time.perf_counter() - t0,
+                                    cpu_time=cpu_time, peak_rss=peak_rss, exit_code=exit_code,
+                                    output_size=output_size)
+            except Exception as e:
+                job.emit(f"\n[Не удалось записать историю запуска: {e}]\n")
+        job._finish()
+        self._dispatch()
+
+    def _run_script(self, job):
+        job.emit(f"Запускаю: {' '.join(shlex.quote(c) for c in job.cmd)}\n\n")
+        proc = subprocess.Popen(job.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        job.pid = proc.pid
+        with self._lock:
+            job._kill = lambda: kill_process_tree(proc)
+            cancelled = job._cancelled
+        if cancelled:
+            kill_process_tree(proc)
+        sampler = RssSampler(proc.pid).start()
+        # читаем сырыми кусками (сколько есть в пайпе), а не построчно
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors="replace"), translate=True)
+        output_size = 0
+        try:
+            while True:
+                chunk = proc.stdout.read(65536)
+                if not chunk:
+                    break
+                output_size += len(chunk)
+                job.emit(decoder.decode(chunk))
+            job.emit(decoder.decode(b"", final=True))
+        except Exception as e:
+            job.emit(f"\n[Ошибка чтения вывода процесса: {e}]\n")
+        finally:
+            proc.wait()
+            sampler.stop()
+        job.emit(f"\n[Процесс завершился с кодом {proc.returncode}]\n")
+        return proc.returncode, sampler.cpu_time, sampler.peak_rss, output_size
+
+    def _run_function(self, job):
+        path = script_path(job.script)
+        job.emit(f"Запускаю в воркере: {path} main(*{json.dumps(job.args, ensure_ascii=False)})\n\n")
+        samplers = []
+        output_size = 0
+
+        def on_output(text):
+            nonlocal output_size
+            output_size += len(text.encode("utf-8"))
+            job.emit(text)
+
+        def on_start(worker):
+            job.pid = worker.pid
+            with self._lock:
+                # остановка = убить воркер; пул заменит его новым
+                job._kill = lambda: kill_process_tree(worker.proc)
+                cancelled = job._cancelled
+            if cancelled:
+                kill_process_tree(worker.proc)
+            samplers.append(RssSampler(worker.pid, relative=True).start())
+
+        try:
+            result = self.worker_pool.run(path, job.args, on_output, on_start=on_start)
+        finally:
+            for sampler in samplers:
+                sampler.stop()
+        if result.get("crashed"):
+            job.emit(f"\n[Воркер аварийно завершился с кодом {result.get('exit_code')}]\n")
+        else:
+            job.emit(f"\n[Функция завершилась с кодом {result.get('exit_code')}]\n")
+        # CPU-время воркер меряет сам; прирост RSS за задание — только если есть psutil
+        peak_rss = samplers[0].peak_rss if samplers else None
+        return result.get("exit_code"), result.get("cpu_time"), peak_rss, output_size
+
+
+# ----------------------------
+# Аргументы запуска
+# ----------------------------
+def split_list(val):
+    return [p.strip() for p in val.split(",") if p.strip() != ""]
+
+
+def build_command(script, values):
+    """
+    Команда для режима script: пример python path/to/test.py --param1 value1 --list paramA,paramB
+    values: имя параметра -> строка как в поле ввода. Ошибки — ValueError с текстом для пользователя.
+    """
+    language = script.get("language", "python")
+    path = script_path(script)
+    if language == "python":
+        cmd = [sys.executable, path]
+    elif language == "bash":
+        cmd = ["bash", path]
+    elif language == "powershell":
+        cmd = ["powershell", "-File", path]
+    else:
+        raise ValueError(f"Неизвестный язык: {language}")
+
+    # добавляем параметры как --name value
+    for p in script.get("params", []):
+        name, ptype = p["name"], p["type"]
+        val = values.get(name, "")
+        if val == "":
+            continue
+        cli_name = f"--{name}"
+        if ptype == "число":
+            try:
+                float(val)  # проверка
+            except ValueError:
+                raise ValueError(f"Параметр {name} должен быть числом")
+            cmd += [cli_name, str(val)]
+        elif ptype == "список чисел":
+            try:
+                parts = [str(float(x)) for x in split_list(val)]
+            except ValueError:
+                raise ValueError(f"Параметр {name} должен быть списком чисел через запятую")
+            # передадим как запятую-список
+            cmd += [cli_name, ",".join(parts)]
+        elif ptype == "список строк":
+            cmd += [cli_name, ",".join(split_list(val))]
+        else:  # строка, путь до директории или файловый путь
+            cmd += [cli_name, val]
+    return cmd
+
+
+def build_function_args(script, values):
+    """
+    Аргументы main(*args) для режима function (уходят в воркер как JSON, чтобы корректно
+    пробросить списки/числа/строки). Ошибки — ValueError с текстом для пользователя.
+    """
+    parsed_args = []
+    for p in script.get("params", []):
+        name, ptype = p["name"], p["type"]
+        val = values.get(name, "")
+        if ptype == "число":
+            if val == "":
+                parsed_args.append(None)
+                continue
+            try:
+                parsed_args.append(float(val) if "." in val else int(val))
+            except ValueError:
+                raise ValueError(f"Параметр {name} должен быть числом")
+        elif ptype == "список чисел":
+            try:
+                parsed_args.append([float(x) if "." in x else int(x) for x in split_list(val)])
+            except ValueError:
+                raise ValueError(f"{name}: список чисел должен быть через запятую")
+        elif ptype == "список строк":
+            parsed_args.append(split_list(val))
+        else:
+            parsed_args.append(val)
+    return parsed_args
+
+
+def make_job(script, values, priority=0, on_output=None, on_finish=None):
+    """Задача для очереди по значениям параметров (строки как в полях окна запуска)"""
+    mode = script.get("mode", "script")
+    if mode == "script":
+        cmd = build_command(script, values)
+        return Job(script, "script", cmd[1:], cmd=cmd, priority=priority, on_output=on_output, on_finish=on_finish)
+    if mode == "function":
+        args = build_function_args(script, values)
+        if script.get("language", "python") != "python":
+            raise ValueError("Режим function поддерживается только для python-скриптов")
+        return Job(script, "function", args, priority=priority, on_output=on_output, on_finish=on_finish)
+    raise ValueError(f"Неизвестный режим: {mode}")
+
+
+def cell_to_str(value):
+    """Значение из таблицы параметров -> строка как в поле ввода (списки — через запятую)"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return ",".join(cell_to_str(v) for v in value)
+    return str(value).strip()
+
+
+def load_param_table(path, script):
+    """
+    Таблица наборов параметров для пакетного запуска: список dict имя -> строка.
+    CSV — с заголовком из имён параметров (разделитель , или ;);
+    JSON — список объектов {имя: значение} или список списков в порядке параметров.
+    """
+    names = [p["name"] for p in script.get("params", [])]
+    if path.lower().endswith(".json"):
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Не удалось разобрать JSON {path}: {e}") from e
+        if isinstance(data, dict):
+            data = data.get("rows", [])
+        rows = []
+        for item in data:
+            if isinstance(item, dict):
+                rows.append({name: cell_to_str(item.get(name)) for name in names})
+            elif isinstance(item, (list, tuple)):
+                rows.append({name: cell_to_str(v) for name, v in zip(names, item)})
+            else:
+                raise ValueError(f"Неподдерживаемая строка таблицы: {item!r}")
+        return rows
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.DictReader(f, dialect=dialect)
+        unknown = [c for c in reader.fieldnames or [] if c not in names]
+        if unknown:
+            raise ValueError(f"В таблице есть столбцы, которых нет среди параметров: {', '.join(unknown)}")
+        return [{name: cell_to_str(row.get(name)) for name in names} for row in reader]
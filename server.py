@@ -0,0 +1,276 @@
+"""
+Локальный HTTP API реестра скриптов (asyncio, без сторонних зависимостей)
+  GET  /scripts?q=текст&desc=1&code=1   — список / поиск скриптов (JSON)
+  GET  /jobs                            — задачи и их состояние (JSON)
+  POST /scripts/<id>/run                — запуск; тело JSON {"params": {имя: значение}, "priority": 0}
+       вывод отдаётся потоком: text/plain (chunked), а с Accept: text/event-stream — как SSE
+       (события output, в конце — done с состоянием и кодом выхода)
+  POST /jobs/<id>/cancel                — отменить задачу в очереди или остановить выполняющуюся
+Защита (по умолчанию слушает только 127.0.0.1):
+  - токен, выдаваемый при каждом запуске: заголовок Authorization: Bearer <токен>
+  - Host — только loopback (или адрес, на котором слушает сервер): защита от DNS rebinding
+  - запросы с заголовком Origin (из браузера) отклоняются, POST — только с Content-Type: application/json
+"""
+
+import asyncio
+import functools
+import hmac
+import json
+import secrets
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from runner import JobScheduler, RunHistory, WorkerPool, cell_to_str, make_job
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+MAX_BODY = 1 << 20
+OUTPUT_QUEUE_SIZE = 256  # кусков вывода на запрос; медленный клиент притормаживает задачу, а не копит память
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+
+def script_info(s):
+    return {key: s.get(key) for key in ("id", "name", "description", "language", "mode", "params")}
+
+
+def job_info(job):
+    return {
+        "id": job.id,
+        "script_id": job.script.get("id"),
+        "name": job.script.get("name"),
+        "state": job.state,
+        "priority": job.priority,
+        "exit_code": job.exit_code,
+        "created": job.created,
+        "started": job.started,
+        "finished": job.finished,
+        "pid": job.pid,
+    }
+
+
+def host_name(value):
+    """Имя хоста из заголовка Host без порта ("[::1]:8765" -> "::1")"""
+    value = value.strip().lower()
+    if value.startswith("["):
+        return value[1:value.find("]")]
+    return value.rsplit(":", 1)[0] if value.count(":") == 1 else value
+
+
+class ApiServer:
+    def __init__(self, manager, scheduler, token, host="127.0.0.1"):
+        self.manager = manager
+        self.scheduler = scheduler
+        self.token = token
+        self.allowed_hosts = LOOPBACK_HOSTS | {host_name(host)}
+
+    def _reject(self, method, headers):
+        """(код, ошибка) для запроса, который нельзя обрабатывать, иначе None"""
+        if host_name(headers.get("host", "")) not in self.allowed_hosts:
+            return 403, "host not allowed"
+        if "origin" in headers:
+            return 403, "cross-origin requests are not allowed"
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer ") or not hmac.compare_digest(auth[len("Bearer "):].strip(), self.token):
+            return 401, "invalid or missing token"
+        if method == "POST" and headers.get("content-type", "").split(";")[0].strip().lower() != "application/json":
+            return 415, "Content-Type must be application/json"
+        return None
+
+    async def handle(self, reader, writer):
+        try:
+            method, target, headers, body = await self._read_request(reader)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        try:
+            rejected = self._reject(method, headers)
+            if rejected:
+                return await self._send_json(writer, rejected[0], {"error": rejected[1]})
+            await self._route(method, target, headers, body, reader, writer)
+        except ConnectionError:
+            pass  # клиент отключился — задача продолжает выполняться
+        except Exception as e:
+            # до начала потока вывода; ошибки во время потока _run сообщает в самом потоке
+            await self._send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        method, target, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY:
+            raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _route(self, method, target, headers, body, reader, writer):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if parts == ["scripts"]:
+            if method != "GET":
+                return await self._send_json(writer, 405, {"error": "method not allowed"})
+            flag = lambda name: query.get(name, "") not in ("", "0", "false")
+            # поиск по коду читает файлы — не в потоке цикла событий
+            search = functools.partial(self.manager.search, query.get("q", ""), search_name=True,
+                                       search_desc=flag("desc"), search_code=flag("code"))
+            scripts = await asyncio.get_running_loop().run_in_executor(None, search)
+            return await self._send_json(writer, 200, [script_info(s) for s in scripts])
+
+        if parts == ["jobs"]:
+            if method != "GET":
+                return await self._send_json(writer, 405, {"error": "method not allowed"})
+            return await self._send_json(writer, 200, [job_info(j) for j in self.scheduler.jobs()])
+
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            if method != "POST":
+                return await self._send_json(writer, 405, {"error": "method not allowed"})
+            if not parts[1].isdigit():
+                return await self._send_json(writer, 404, {"error": "job not found"})
+            self.scheduler.cancel(int(parts[1]))
+            job = next((j for j in self.scheduler.jobs() if j.id == int(parts[1])), None)
+            if job is None:
+                return await self._send_json(writer, 404, {"error": "job not found"})
+            return await self._send_json(writer, 200, job_info(job))
+
+        if len(parts) == 3 and parts[0] == "scripts" and parts[2] == "run":
+            if method != "POST":
+                return await self._send_json(writer, 405, {"error": "method not allowed"})
+            script = self.manager.get(parts[1])
+            if script is None:
+                return await self._send_json(writer, 404, {"error": "script not found"})
+            sse = "text/event-stream" in headers.get("accept", "") or query.get("stream") == "sse"
+            return await self._run(script, body, sse, reader, writer)
+
+        return await self._send_json(writer, 404, {"error": "not found"})
+
+    async def _run(self, script, body, sse, reader, writer):
+        try:
+            payload = json.loads(body or b"{}")
+            values = {name: cell_to_str(value) for name, value in (payload.get("params") or {}).items()}
+            priority = int(payload.get("priority", 0))
+        except (ValueError, AttributeError, TypeError) as e:
+            return await self._send_json(writer, 400, {"error": f"bad request body: {e}"})
+
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        output = asyncio.Queue(OUTPUT_QUEUE_SIZE)
+
+        def put(item):
+            if threading.get_ident() == loop_thread:
+                # из цикла событий пишут только submit/cancel — пара строк, очередь в этот момент не полна
+                output.put_nowait(item)
+            else:
+                # поток задачи ждёт места в очереди: так медленный клиент не раздувает память
+                asyncio.run_coroutine_threadsafe(output.put(item), loop).result()
+
+        try:
+            job = make_job(script, values, priority=priority, on_output=put, on_finish=lambda j: put(None))
+        except ValueError as e:
+            return await self._send_json(writer, 400, {"error": str(e)})
+
+        content_type = "text/event-stream; charset=utf-8" if sse else "text/plain; charset=utf-8"
+        writer.write(self._head(200, content_type, {"Transfer-Encoding": "chunked", "Cache-Control": "no-cache",
+                                                    "X-Job-Id": str(job.id)}))
+        self.scheduler.submit(job)
+
+        # клиент закрыл соединение — задачу останавливаем, вывод дочитываем вхолостую до конца
+        eof = asyncio.ensure_future(reader.read())
+        connected = True
+        finished = False
+        try:
+            while not finished:
+                get = asyncio.ensure_future(output.get())
+                if connected:
+                    await asyncio.wait({get, eof}, return_when=asyncio.FIRST_COMPLETED)
+                    if eof.done() and not get.done():
+                        connected = False
+                        self.scheduler.cancel(job.id)
+                items = [await get]
+                # всё, что накопилось, уходит одним куском
+                while not output.empty():
+                    items.append(output.get_nowait())
+                finished = None in items
+                text = "".join(item for item in items if item is not None)
+                if text and connected:
+                    try:
+                        await self._send_chunk(writer, _sse("output", text) if sse else text)
+                    except ConnectionError:
+                        connected = False
+                        self.scheduler.cancel(job.id)
+            if not connected:
+                return
+            if sse:
+                await self._send_chunk(writer, _sse("done", json.dumps(job_info(job), ensure_ascii=False)))
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            self.scheduler.cancel(job.id)
+        except Exception as e:
+            # заголовки уже ушли — ошибку сообщаем в потоке и корректно закрываем chunked-ответ
+            self.scheduler.cancel(job.id)
+            message = f"server error: {e}"
+            try:
+                await self._send_chunk(writer, _sse("error", message) if sse else f"\n[{message}]\n")
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            eof.cancel()
+            # поток задачи может ждать места в очереди — дочитываем до конца, чтобы он не завис
+            while not finished:
+                finished = await output.get() is None
+
+    @staticmethod
+    def _head(status, content_type, extra=None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 "Connection: close"]
+        lines += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(self._head(status, "application/json; charset=utf-8", {"Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    @staticmethod
+    async def _send_chunk(writer, text):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+
+def _sse(event, text):
+    return f"event: {event}\n" + "".join(f"data: {line}\n" for line in text.split("\n")) + "\n"
+
+
+async def _serve(api, host, port):
+    server = await asyncio.start_server(api.handle, host, port)
+    print(f"HTTP API: http://{host}:{port}  (Ctrl+C — остановить)", flush=True)
+    print(f"Токен: {api.token}  (заголовок Authorization: Bearer <токен>)", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(manager, host="127.0.0.1", port=8765, max_jobs=None, token=None):
+    """token=None — новый случайный токен на каждый запуск"""
+    pool = WorkerPool(max_jobs)
+    scheduler = JobScheduler(pool, RunHistory(), max_total=max_jobs or pool.size)
+    api = ApiServer(manager, scheduler, token or secrets.token_urlsafe(24), host)
+    try:
+        asyncio.run(_serve(api, host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.shutdown()
+        pool.shutdown()
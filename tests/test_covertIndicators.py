@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("lxml")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Scripts"))
+
+import covertIndicators  # noqa: E402
+
+
+def indicator(num):
+    return (f'\n    <Indicator><Code>c{num}</Code><Name>Показатель &amp; "{num}"</Name>'
+            f'<Type>{num % 3}</Type><IsInteger>{num % 2}</IsInteger></Indicator>')
+
+
+@pytest.fixture
+def multi_container(tmp_path):
+    """Показатели в нескольких контейнерах, с пространством имён и комментарием между ними"""
+    parts = ["<?xml version='1.0' encoding='UTF-8'?>\n",
+             '<Root xmlns:x="urn:test">\n  <Meta><x:Info>ok</x:Info></Meta>\n  <Indicators x:group="1">']
+    for num in range(120):
+        if num in (30, 75):
+            parts.append(f"\n  </Indicators>\n  <!-- группа {num} -->\n  <Indicators x:group=\"{num}\">")
+        if num == 100:
+            parts.append("\n  </Indicators>\n  <Other><Indicators>")
+        parts.append(indicator(num))
+    parts.append("\n  </Indicators></Other>\n</Root>\n")
+    path = tmp_path / "indicators.xml"
+    path.write_text("".join(parts), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("codes", [None, ["c0", "c31", "c76", "c119"], ["missing"]])
+def test_sharded_matches_serial(multi_container, tmp_path, codes):
+    serial = tmp_path / "serial.xml"
+    sharded = tmp_path / "sharded.xml"
+    expected = covertIndicators.transform_xml(str(multi_container), str(serial), codes)
+    assert len(covertIndicators.find_shards(str(multi_container), 6)) > 1
+    count = covertIndicators.transform_xml_sharded(str(multi_container), str(sharded), codes, processes=6)
+    assert count == expected
+    assert sharded.read_bytes() == serial.read_bytes()
+
+
+def test_all_indicators_converted(multi_container, tmp_path):
+    output = tmp_path / "out.xml"
+    assert covertIndicators.transform_xml_sharded(str(multi_container), str(output), processes=6) == 120
+    assert output.read_bytes().startswith(b"<?xml version='1.0' encoding='UTF-8'?>\n<Data>\n  <Indicator ")
+    assert output.read_bytes().endswith(b"/>\n</Data>\n")
+
+
+def test_empty_result(multi_container, tmp_path):
+    output = tmp_path / "out.xml"
+    assert covertIndicators.transform_xml(str(multi_container), str(output), ["missing"]) == 0
+    assert output.read_bytes() == b"<?xml version='1.0' encoding='UTF-8'?>\n<Data/>\n"
+
+
+def test_indicator_text_inside_cdata(tmp_path):
+    """Текст "<Indicator" в CDATA может попасть на границу части — тогда конвертация идёт в один поток"""
+    parts = ["<?xml version='1.0' encoding='UTF-8'?>\n<Root><Indicators>"]
+    for num in range(60):
+        parts.append(f"\n  <Indicator><Code>c{num}</Code><Description><![CDATA[x <Indicator y]]></Description>"
+                     f"<Type>0</Type></Indicator>")
+    parts.append("\n</Indicators></Root>\n")
+    path = tmp_path / "cdata.xml"
+    path.write_text("".join(parts), encoding="utf-8")
+    serial = tmp_path / "serial.xml"
+    sharded = tmp_path / "sharded.xml"
+    expected = covertIndicators.transform_xml(str(path), str(serial))
+    assert covertIndicators.transform_xml_sharded(str(path), str(sharded), processes=6) == expected == 60
+    assert sharded.read_bytes() == serial.read_bytes()
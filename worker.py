@@ -0,0 +1,132 @@
+"""
+Долгоживущий воркер для режима function
+- Читает задания из stdin (по одному JSON на строку): {"path": ..., "args": [...]}
+- Импортирует модуль скрипта один раз и держит его в кэше (перезагружает при изменении mtime)
+- Вызывает main(*args); stdout/stderr скрипта идут в собственный stdout воркера
+- По окончании задания печатает маркер DONE_MARKER + JSON с результатом
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+
+DONE_MARKER = "\x00__WORKER_DONE__"
+
+# путь скрипта -> (mtime_ns, модуль)
+_modules = {}
+# файлы модулей, загруженных из папок скриптов -> mtime_ns на момент загрузки
+_tracked_files = {}
+_script_dirs = set()
+
+
+def _module_name(path):
+    """Имя модуля = имя файла (чтобы pickle/multiprocessing находили функции скрипта)"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    existing = sys.modules.get(name)
+    if existing is not None and os.path.abspath(getattr(existing, "__file__", "") or "") != path:
+        # имя занято чужим модулем (например, stdlib) — берём уникальное
+        name = f"user_module_{abs(hash(path))}"
+    return name
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _track_loaded_modules():
+    """Запоминаем mtime всех модулей, загруженных из папок скриптов (вспомогательные модули)"""
+    for module in list(sys.modules.values()):
+        file = getattr(module, "__file__", None)
+        if not file:
+            continue
+        file = os.path.abspath(file)
+        if os.path.dirname(file) in _script_dirs and file not in _tracked_files:
+            _tracked_files[file] = _mtime(file)
+
+
+def _invalidate_stale():
+    """Если изменился любой модуль из папок скриптов — выгружаем их все"""
+    if not any(_mtime(f) != m for f, m in _tracked_files.items()):
+        return
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, "__file__", None)
+        if file and os.path.abspath(file) in _tracked_files:
+            del sys.modules[name]
+    _tracked_files.clear()
+    _modules.clear()
+
+
+def load_module(path):
+    path = os.path.abspath(path)
+    _invalidate_stale()
+    mtime = _mtime(path)
+    cached = _modules.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    script_dir = os.path.dirname(path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    _script_dirs.add(script_dir)
+
+    name = _module_name(path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    _modules[path] = (mtime, module)
+    _track_loaded_modules()
+    return module
+
+
+def run_job(job):
+    exit_code = 0
+    cpu_start = time.process_time()
+    try:
+        module = load_module(job["path"])
+        if hasattr(module, "main"):
+            res = module.main(*job.get("args", []))
+            if res is not None:
+                print(res)
+        else:
+            print("Module has no main(*args)")
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    return {"exit_code": exit_code, "cpu_time": time.process_time() - cpu_start}
+
+
+def main():
+    control_in = sys.stdin
+    # скрипт не должен читать управляющий канал через input()
+    sys.stdin = open(os.devnull, "r", encoding="utf-8")
+    for line in control_in:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        result = run_job(job)
+        sys.stderr.flush()
+        sys.stdout.write(DONE_MARKER + json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()